@@ -0,0 +1,341 @@
+# Copyright 2017 Chris Cartland. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for the data structures and algorithms.
+
+Usage:
+  python benchmark.py            Run every benchmark.
+  python benchmark.py NAME ...   Run the named benchmarks.
+"""
+
+import random
+import sys
+import threading
+import time
+
+from bst import ArrayBST
+from bst import BST
+from heap import ConcurrentHeap
+from heap import Heap
+from heap import merge
+import sort
+
+
+def bst_churn(operations=1000000, key_range=100000, report_every=100000):
+  """Mixed inserts and deletes on a BST. The depth should stay stable."""
+  rng = random.Random(0)
+  for self_balancing in (False, True):
+    print 'BST churn, self_balancing=%s' % self_balancing
+    bst = BST(self_balancing=self_balancing)
+    items = [rng.randint(0, key_range) for _ in xrange(key_range / 2)]
+    for item in items:
+      bst.insert(item)
+    start = time.time()
+    for i in xrange(1, operations + 1):
+      if rng.random() < 0.5 or len(items) == 0:
+        item = rng.randint(0, key_range)
+        bst.insert(item)
+        items.append(item)
+      else:
+        # Delete an existing item so the tree size stays stable.
+        index = rng.randrange(len(items))
+        items[index], items[-1] = items[-1], items[index]
+        bst.delete(items.pop())
+      if i % report_every == 0:
+        print '  %8d ops  count %7d  depth %4d  %.1fs' % (i, bst.count(),
+            bst.depth(), time.time() - start)
+
+
+def bst_memory(size=1000000):
+  """Bytes per node for BST and ArrayBST, not counting the items."""
+  print 'BST memory, %d items' % size
+  bst = BST(self_balancing=True)
+  array_bst = ArrayBST()
+  for item in xrange(size):
+    bst.insert(item)
+    array_bst.insert(item)
+  node_bytes = sum(sys.getsizeof(node) for node in
+                   BST.in_order_nodes(bst.root))
+  array_bytes = sys.getsizeof(array_bst.keys)
+  for column in (array_bst.left, array_bst.right, array_bst.height,
+                 array_bst.size):
+    array_bytes += column.buffer_info()[1] * column.itemsize
+  print '  BST       %6.1f bytes per node' % (float(node_bytes) / size)
+  print '  ArrayBST  %6.1f bytes per node' % (float(array_bytes) / size)
+
+
+def bst_batch(size=200000, batch_size=20000):
+  """Batched insert_many and find_many against one call per item."""
+  rng = random.Random(0)
+  data = [rng.randint(0, size * 10) for _ in xrange(size)]
+  print 'BST batches, %d items in batches of %d' % (size, batch_size)
+  bst = BST()
+  start = time.time()
+  for item in data:
+    bst.insert(item)
+  print '  insert       %.2fs' % (time.time() - start)
+  batched_bst = BST()
+  start = time.time()
+  for i in xrange(0, size, batch_size):
+    batched_bst.insert_many(data[i:i + batch_size])
+  print '  insert_many  %.2fs' % (time.time() - start)
+  queries = [rng.randint(0, size * 10) for _ in xrange(batch_size)]
+  start = time.time()
+  for item in queries:
+    bst.find(item)
+  print '  find         %.2fs' % (time.time() - start)
+  start = time.time()
+  bst.find_many(queries)
+  print '  find_many    %.2fs' % (time.time() - start)
+
+
+def heap_churn(operations=1000000, size=100000, report_every=100000):
+  """Long-running inserts and pops, then a full drain of the heap."""
+  rng = random.Random(0)
+  print 'Heap churn, %d items' % size
+  heap = Heap()
+  for _ in xrange(size):
+    heap.insert(rng.random())
+  start = time.time()
+  for i in xrange(1, operations + 1):
+    if rng.random() < 0.5:
+      heap.insert(rng.random())
+    elif heap.count() > 0:
+      heap.pop()
+    if i % report_every == 0:
+      print '  %8d ops  count %7d  list length %7d  %.1fs' % (i,
+          heap.count(), len(heap.items), time.time() - start)
+  while heap.count() > 0:
+    heap.pop()
+  print '  drained    count %7d  list length %7d  %.1fs' % (heap.count(),
+      len(heap.items), time.time() - start)
+
+
+def heap_arity(size=100000, operations=200000):
+  """Insert-heavy and pop-heavy mixes for heaps of different arity."""
+  print 'Heap arity, %d items, %d ops' % (size, operations)
+  for insert_fraction in (0.9, 0.5, 0.1):
+    for arity in (2, 4, 8):
+      rng = random.Random(0)
+      heap = Heap.from_iterable((rng.random() for _ in xrange(size)),
+                                arity=arity)
+      start = time.time()
+      for _ in xrange(operations):
+        if rng.random() < insert_fraction or heap.count() == 0:
+          heap.insert(rng.random())
+        else:
+          heap.pop()
+      print '  %2d%% inserts  arity %d  %.2fs' % (insert_fraction * 100, arity,
+          time.time() - start)
+
+
+class TimedLock(object):
+  """Lock that records how long it is held."""
+
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.acquired_at = 0
+    self.acquisitions = 0
+    self.hold_time = 0.0
+
+  def acquire(self, blocking=True):
+    result = self.lock.acquire(blocking)
+    if result:
+      self.acquired_at = time.time()
+      self.acquisitions += 1
+    return result
+
+  def release(self):
+    self.hold_time += time.time() - self.acquired_at
+    self.lock.release()
+
+  __enter__ = acquire
+
+  def __exit__(self, *args):
+    self.release()
+
+
+def heap_contention(operations=64000, batch_size=16):
+  """ConcurrentHeap with 1 to 32 threads, one item or a batch per lock."""
+  print 'ConcurrentHeap contention, %d items per run' % operations
+  for batched in (False, True):
+    for thread_count in (1, 2, 4, 8, 16, 32):
+      heap = ConcurrentHeap()
+      lock = TimedLock()
+      heap.condition = threading.Condition(lock)
+      per_thread = operations / thread_count
+      def work(seed):
+        rng = random.Random(seed)
+        if batched:
+          for _ in xrange(per_thread / batch_size):
+            heap.push_many([rng.random() for _ in xrange(batch_size)])
+            heap.pop_many(batch_size)
+        else:
+          for _ in xrange(per_thread):
+            heap.insert(rng.random())
+            heap.pop()
+      threads = [threading.Thread(target=work, args=(i,))
+                 for i in xrange(thread_count)]
+      start = time.time()
+      for thread in threads:
+        thread.start()
+      for thread in threads:
+        thread.join()
+      elapsed = time.time() - start
+      print '  batched %-5s  threads %2d  %.2fs  %6d locks  %5.1fus held' % (
+          batched, thread_count, elapsed, lock.acquisitions,
+          1e6 * lock.hold_time / max(lock.acquisitions, 1))
+
+
+def heap_merge(runs=100, run_length=10000):
+  """K-way merge of sorted runs, one item or a batch at a time."""
+  rng = random.Random(0)
+  inputs = [sorted(rng.random() for _ in xrange(run_length))
+            for _ in xrange(runs)]
+  print 'Heap merge, %d runs of %d items' % (runs, run_length)
+  for batch_size in (None, 64, 1024):
+    start = time.time()
+    for _ in merge(*inputs, batch_size=batch_size):
+      pass
+    print '  batch_size %-5s  %.2fs' % (batch_size, time.time() - start)
+
+
+def sort_patterns(size=100000):
+  """The faster sorters on random, nearly sorted and duplicate-heavy data."""
+  rng = random.Random(0)
+  nearly_sorted = range(size)
+  for _ in xrange(size / 100):
+    i = rng.randrange(size)
+    j = rng.randrange(size)
+    nearly_sorted[i], nearly_sorted[j] = nearly_sorted[j], nearly_sorted[i]
+  patterns = [
+      ('random', [rng.random() for _ in xrange(size)]),
+      ('nearly sorted', nearly_sorted),
+      ('reversed', range(size, 0, -1)),
+      ('0-100', [rng.randint(0, 100) for _ in xrange(size)]),
+  ]
+  sorters = [
+      ('heap', sort.HeapSorter()),
+      ('merge', sort.MergeSorter()),
+      ('merge bottom up', sort.MergeSorter(bottom_up=True)),
+      ('quick', sort.QuickSorter()),
+      ('quick three way', sort.QuickSorter(three_way=True)),
+      ('hybrid', sort.HybridSorter()),
+  ]
+  print 'Sorters, %d items' % size
+  for name, data in patterns:
+    for sorter_name, sorter in sorters:
+      start = time.time()
+      try:
+        sorter.sort(data)
+      except RuntimeError:
+        print '  %-14s %-16s recursion limit' % (name, sorter_name)
+        continue
+      print '  %-14s %-16s %.2fs' % (name, sorter_name, time.time() - start)
+
+
+def sort_integers(size=200000):
+  """Counting and radix sorts against comparison sorts on integer keys."""
+  rng = random.Random(0)
+  patterns = [
+      ('0-100', [rng.randint(0, 100) for _ in xrange(size)]),
+      ('32-bit', [rng.randint(0, 2 ** 32) for _ in xrange(size)]),
+  ]
+  sorters = [
+      ('merge bottom up', sort.MergeSorter(bottom_up=True)),
+      ('hybrid', sort.HybridSorter()),
+      ('counting', sort.CountingSorter()),
+      ('radix', sort.RadixSorter()),
+  ]
+  print 'Integer sorters, %d items' % size
+  for name, data in patterns:
+    for sorter_name, sorter in sorters:
+      start = time.time()
+      sorter.sort(data)
+      print '  %-8s %-16s %.2fs' % (name, sorter_name, time.time() - start)
+
+
+def sort_vectorized(size=1000000):
+  """NumPy sort paths against the pure-Python sorters on numeric data."""
+  if sort.numpy is None:
+    print 'Vectorized sorters skipped, NumPy is not installed'
+    return
+  rng = random.Random(0)
+  data = [rng.random() for _ in xrange(size)]
+  sorters = [
+      ('merge bottom up', sort.MergeSorter(bottom_up=True)),
+      ('hybrid', sort.HybridSorter()),
+      ('merge vectorized', sort.MergeSorter(vectorized=True)),
+      ('quick vectorized', sort.QuickSorter(vectorized=True)),
+  ]
+  print 'Vectorized sorters, %d floats' % size
+  for sorter_name, sorter in sorters:
+    start = time.time()
+    sorter.sort(data)
+    print '  %-16s %.2fs' % (sorter_name, time.time() - start)
+
+
+def sort_parallel(size=1000000):
+  """ParallelSorter with 1 to 16 processes on random integers."""
+  rng = random.Random(0)
+  data = [rng.randint(0, 2 ** 31) for _ in xrange(size)]
+  print 'Parallel sorter, %d integers, %d CPUs' % (size,
+      sort.multiprocessing.cpu_count())
+  for processes in (1, 2, 4, 8, 16):
+    sorter = sort.ParallelSorter(processes=processes)
+    start = time.time()
+    sorter.sort(data)
+    print '  processes %2d  %.2fs' % (processes, time.time() - start)
+
+
+def sort_external(size=1000000):
+  """ExternalSorter with different run sizes against an in-memory sort."""
+  rng = random.Random(0)
+  data = [rng.randint(0, 2 ** 31) for _ in xrange(size)]
+  print 'External sorter, %d integers' % size
+  start = time.time()
+  sort.HybridSorter().sort(data)
+  print '  in memory          %.2fs' % (time.time() - start)
+  for run_size in (size / 100, size / 10):
+    sorter = sort.ExternalSorter(run_size=run_size)
+    start = time.time()
+    for _ in sorter.sort_iter(data):
+      pass
+    print '  run size %-8d  %.2fs' % (run_size, time.time() - start)
+
+
+BENCHMARKS = [
+    bst_churn,
+    bst_memory,
+    bst_batch,
+    heap_churn,
+    heap_arity,
+    heap_contention,
+    heap_merge,
+    sort_patterns,
+    sort_integers,
+    sort_vectorized,
+    sort_parallel,
+    sort_external,
+]
+
+
+def main(names):
+  for benchmark in BENCHMARKS:
+    if len(names) == 0 or benchmark.__name__ in names:
+      benchmark()
+
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
@@ -13,19 +13,99 @@
 # limitations under the License.
 
 from bt import BinaryTreeNode
+import array
+import bisect
+import collections
+import heapq
+import random
+import sys
 import unittest
 
 class BST(object):
   """Binary Search Tree class.
 
-  Supports insert(), find() and delete() operations."""
+  Supports insert(), find() and delete() operations.
 
-  def __init__(self):
+  Unbalanced by default. Use BST(self_balancing=True) to create an AVL tree
+  that rotates during insert() and delete() to keep the depth O(log(N)).
+  """
+
+  def __init__(self, self_balancing=False):
     self.root = None
+    self.is_self_balancing = self_balancing
 
   def __str__(self):
     return str(self.root)
 
+  @classmethod
+  def from_sorted(cls, items, self_balancing=False):
+    """Build a BST with minimal depth from items in sorted order.
+
+    The items are streamed into a vine of nodes, which is then folded into
+    a tree with the Day-Stout-Warren algorithm. No other copy of the items
+    is made, so items can be a generator.
+
+    Args:
+      items: Iterable of values in ascending order.
+      self_balancing: Passed to the BST constructor.
+
+    Returns:
+      A new BST.
+
+    Raises:
+      ValueError: If items are not in sorted order.
+
+    Runtime:
+      O(N) time where N is the number of items.
+    """
+    bst = cls(self_balancing=self_balancing)
+    bst.root = BST.sorted_to_tree(items)
+    return bst
+
+  @staticmethod
+  def sorted_to_tree(items):
+    """Build a tree with minimal depth from items in sorted order.
+
+    Args:
+      items: Iterable of values in ascending order.
+
+    Returns:
+      The root node of the new tree, or None if there are no items.
+
+    Raises:
+      ValueError: If items are not in sorted order.
+    """
+    pseudo_root = BinaryTreeNode(None)
+    tail = pseudo_root
+    size = 0
+    for item in items:
+      if size > 0 and item < tail.datum:
+        raise ValueError('Items must be in sorted order')
+      tail.right = BinaryTreeNode(item)
+      tail = tail.right
+      size += 1
+    BST.vine_to_tree(pseudo_root, size)
+    root = pseudo_root.right
+    pseudo_root.right = None
+    BST.update_tree(root)
+    return root
+
+  @classmethod
+  def from_iterable(cls, items, self_balancing=False):
+    """Build a BST with minimal depth from items in any order.
+
+    Args:
+      items: Iterable of values that can be compared to each other.
+      self_balancing: Passed to the BST constructor.
+
+    Returns:
+      A new BST.
+
+    Runtime:
+      O(N*log(N)) time to sort the items, or O(N) if they are already sorted.
+    """
+    return cls.from_sorted(sorted(items), self_balancing=self_balancing)
+
   def insert(self, item):
     """Inserts an item into the binary search tree.
 
@@ -36,12 +116,18 @@ class BST(object):
       None
     """
     node = BinaryTreeNode(item)
-    self.root = BST.insert_node(self.root, node)
+    if self.is_self_balancing:
+      self.root = BST.insert_node_balanced(self.root, node)
+    else:
+      self.root = BST.insert_node(self.root, node)
 
   @staticmethod
   def insert_node(root, new_node):
     """Insert a node into the tree at root.
 
+    The height and size of every node on the insertion path are updated.
+    new_node may be the root of a subtree with up-to-date height and size.
+
     Args:
       root: Existing node in the tree. Can be None.
       new_node: The node to be inserted into the tree. Can be None.
@@ -54,20 +140,204 @@ class BST(object):
     if root is None:
       return new_node
 
+    path = []
     node = root
     while node is not None:
+      path.append(node)
       if node.datum < new_node.datum:
         if node.right is None:
           node.right = new_node
+          BST.update_path(path)
           return root
         node = node.right
       else:
         if node.left is None:
           node.left = new_node
+          BST.update_path(path)
           return root
         node = node.left
     raise ValueError('Something went wrong')
 
+  def insert_many(self, items):
+    """Inserts a batch of items into the binary search tree.
+
+    The batch is sorted and split at each node on the way down, so a node
+    shared by the search paths of several items is visited only once. Each
+    run of items that reaches an empty branch is attached as a subtree with
+    minimal depth.
+
+    A self-balancing tree is rebuilt from a merge of its items and the batch
+    when the batch is at least as large as the tree. Smaller batches are
+    inserted one at a time in sorted order.
+
+    Args:
+      items: Iterable of values that can be compared to values in the tree.
+
+    Returns:
+      None
+
+    Runtime:
+      O(K*log(K) + M) time for K items, where M is the number of nodes on
+      the union of their search paths.
+    """
+    items = sorted(items)
+    if len(items) == 0:
+      return
+    if self.is_self_balancing:
+      if len(items) >= self.count():
+        self.root = BST.sorted_to_tree(heapq.merge(self.in_order(), items))
+      else:
+        for item in items:
+          self.root = BST.insert_node_balanced(self.root, BinaryTreeNode(item))
+      return
+    if self.root is None:
+      self.root = BST.sorted_to_tree(items)
+      return
+
+    visited = []
+    stack = [(self.root, 0, len(items))]
+    while len(stack) > 0:
+      node, lo, hi = stack.pop()
+      visited.append(node)
+      # Equal items go left, the same as insert_node().
+      split = bisect.bisect_right(items, node.datum, lo, hi)
+      if lo < split:
+        if node.left is None:
+          node.left = BST.sorted_to_tree(items[i] for i in xrange(lo, split))
+        else:
+          stack.append((node.left, lo, split))
+      if split < hi:
+        if node.right is None:
+          node.right = BST.sorted_to_tree(items[i] for i in xrange(split, hi))
+        else:
+          stack.append((node.right, split, hi))
+    # Children were visited after their parents.
+    for i in xrange(len(visited) - 1, -1, -1):
+      BST.update_node(visited[i])
+
+  @staticmethod
+  def insert_node_balanced(root, new_node):
+    """Insert a node into the AVL tree at root.
+
+    Args:
+      root: Existing node in the AVL tree. Can be None.
+      new_node: The node to be inserted into the tree. Can be None.
+
+    Returns:
+      The modified root node.
+
+    Runtime:
+      O(log(N)) time where N is the number of nodes in the tree.
+    """
+    if new_node is None:
+      return root
+    new_node.left = None
+    new_node.right = None
+    new_node.height = 1
+    new_node.size = 1
+    if root is None:
+      return new_node
+
+    path = []
+    node = root
+    while node is not None:
+      path.append(node)
+      if node.datum < new_node.datum:
+        node = node.right
+      else:
+        node = node.left
+    parent = path[-1]
+    if parent.datum < new_node.datum:
+      parent.right = new_node
+    else:
+      parent.left = new_node
+    return BST.rebalance_path(path)
+
+  @staticmethod
+  def rebalance_path(path):
+    """Rebalance every node on a path, starting from the deepest node.
+
+    Args:
+      path: List of nodes from the root down to the last modified node.
+          Each node must be a child of the node before it.
+
+    Returns:
+      The new root node of the path.
+    """
+    new_root = None
+    for i in xrange(len(path) - 1, -1, -1):
+      node = path[i]
+      new_root = BST.rebalance_node(node)
+      if i > 0:
+        parent = path[i - 1]
+        if parent.left is node:
+          parent.left = new_root
+        else:
+          parent.right = new_root
+    return new_root
+
+  @staticmethod
+  def rebalance_node(node):
+    """Restore the AVL property for this node and return the new root.
+
+    The children of node must already be balanced with correct heights.
+    """
+    BST.update_node(node)
+    left_height = BST.node_height(node.left)
+    right_height = BST.node_height(node.right)
+    if left_height >= right_height + 2:
+      if BST.node_height(node.left.left) < BST.node_height(node.left.right):
+        node.left = BST.rotate_left(node.left)
+      node = BST.rotate_right(node)
+    elif right_height >= left_height + 2:
+      if BST.node_height(node.right.right) < BST.node_height(node.right.left):
+        node.right = BST.rotate_right(node.right)
+      node = BST.rotate_left(node)
+    return node
+
+  @staticmethod
+  def node_height(node):
+    """Return the stored height of the node, or 0 for None."""
+    if node is None:
+      return 0
+    return node.height
+
+  @staticmethod
+  def node_size(node):
+    """Return the stored size of the node, or 0 for None."""
+    if node is None:
+      return 0
+    return node.size
+
+  @staticmethod
+  def update_node(node):
+    """Recompute the stored height and size of node from its children."""
+    left = node.left
+    right = node.right
+    if left is None:
+      if right is None:
+        node.height = 1
+        node.size = 1
+      else:
+        node.height = 1 + right.height
+        node.size = 1 + right.size
+    elif right is None:
+      node.height = 1 + left.height
+      node.size = 1 + left.size
+    else:
+      node.height = 1 + max(left.height, right.height)
+      node.size = 1 + left.size + right.size
+
+  @staticmethod
+  def update_path(path):
+    """Recompute the stored height and size of every node on a path.
+
+    Args:
+      path: List of nodes from the root down to the last modified node.
+    """
+    for i in xrange(len(path) - 1, -1, -1):
+      BST.update_node(path[i])
+
   def find(self, item):
     """Returns BinaryTreeNode that matches the item, or None if it does not exist.
 
@@ -92,6 +362,230 @@ class BST(object):
         raise ValueError('Something went wrong')
     return None
 
+  def find_many(self, items):
+    """Find a batch of items.
+
+    The batch is sorted and split at each node on the way down, so a node
+    shared by the search paths of several items is visited only once.
+
+    Args:
+      items: Iterable of values that can be compared to values in the tree.
+
+    Returns:
+      A list with the BinaryTreeNode or None for each item, in the same order
+      as items.
+
+    Runtime:
+      O(K*log(K) + M*log(K)) time for K items, where M is the number of nodes
+      on the union of their search paths.
+    """
+    items = list(items)
+    order = sorted(xrange(len(items)), key=items.__getitem__)
+    keys = [items[i] for i in order]
+    results = [None] * len(items)
+    if self.root is None or len(keys) == 0:
+      return results
+    bisect_left = bisect.bisect_left
+    stack = [(self.root, 0, len(keys))]
+    while len(stack) > 0:
+      node, lo, hi = stack.pop()
+      datum = node.datum
+      start = bisect_left(keys, datum, lo, hi)
+      end = start
+      while end < hi and keys[end] == datum:
+        results[order[end]] = node
+        end += 1
+      if lo < start and node.left is not None:
+        stack.append((node.left, lo, start))
+      if end < hi and node.right is not None:
+        stack.append((node.right, end, hi))
+    return results
+
+  def floor(self, item):
+    """Return the largest item that is less than or equal to item.
+
+    Returns:
+      The matching item, or None if there is no such item.
+
+    Runtime:
+      O(depth) time. O(log(N)) for a balanced tree.
+    """
+    result = None
+    node = self.root
+    while node is not None:
+      if node.datum <= item:
+        result = node.datum
+        node = node.right
+      else:
+        node = node.left
+    return result
+
+  def ceiling(self, item):
+    """Return the smallest item that is greater than or equal to item.
+
+    Returns:
+      The matching item, or None if there is no such item.
+
+    Runtime:
+      O(depth) time. O(log(N)) for a balanced tree.
+    """
+    result = None
+    node = self.root
+    while node is not None:
+      if node.datum >= item:
+        result = node.datum
+        node = node.left
+      else:
+        node = node.right
+    return result
+
+  def predecessor(self, item):
+    """Return the largest item that is strictly less than item.
+
+    Returns:
+      The matching item, or None if there is no such item.
+
+    Runtime:
+      O(depth) time. O(log(N)) for a balanced tree.
+    """
+    result = None
+    node = self.root
+    while node is not None:
+      if node.datum < item:
+        result = node.datum
+        node = node.right
+      else:
+        node = node.left
+    return result
+
+  def successor(self, item):
+    """Return the smallest item that is strictly greater than item.
+
+    Returns:
+      The matching item, or None if there is no such item.
+
+    Runtime:
+      O(depth) time. O(log(N)) for a balanced tree.
+    """
+    result = None
+    node = self.root
+    while node is not None:
+      if item < node.datum:
+        result = node.datum
+        node = node.left
+      else:
+        node = node.right
+    return result
+
+  def iter_range(self, lo=None, hi=None):
+    """Generate the items x where lo <= x <= hi in sorted order.
+
+    Descends once to lo, then streams items in order while holding only
+    O(depth) nodes.
+
+    Args:
+      lo: The lower bound. None if there is no lower bound.
+      hi: The upper bound. None if there is no upper bound.
+
+    Runtime:
+      O(depth + K) time to generate K items.
+    """
+    stack = []
+    node = self.root
+    while True:
+      while node is not None:
+        if lo is not None and node.datum < lo:
+          node = node.right
+        else:
+          stack.append(node)
+          node = node.left
+      if len(stack) == 0:
+        return
+      node = stack.pop()
+      if hi is not None and hi < node.datum:
+        return
+      yield node.datum
+      node = node.right
+
+  def rank(self, item):
+    """Return the number of items in the tree that are less than item.
+
+    Args:
+      item: A value that can be compared to other values in the tree.
+
+    Returns:
+      The number of items strictly less than item.
+
+    Runtime:
+      O(depth) time. O(log(N)) for a balanced tree.
+    """
+    return BST.node_rank(self.root, item, inclusive=False)
+
+  @staticmethod
+  def node_rank(node, item, inclusive):
+    """Count the items in the tree at node that are less than item.
+
+    Args:
+      node: Existing node in the tree. Can be None.
+      item: A value that can be compared to other values in the tree.
+      inclusive: If True, items equal to item are counted as well.
+
+    Returns:
+      The number of matching items.
+    """
+    rank = 0
+    while node is not None:
+      if node.datum < item or (inclusive and node.datum == item):
+        rank += BST.node_size(node.left) + 1
+        node = node.right
+      else:
+        node = node.left
+    return rank
+
+  def select(self, k):
+    """Return the item with rank k, i.e. the (k+1)th smallest item.
+
+    Args:
+      k: Index of the item in sorted order, from 0 to count() - 1.
+
+    Returns:
+      The item at index k.
+
+    Runtime:
+      O(depth) time. O(log(N)) for a balanced tree.
+    """
+    if k < 0 or k >= self.count():
+      raise ValueError('Cannot select index %d from %d items' % (k,
+          self.count()))
+    node = self.root
+    while True:
+      left_size = BST.node_size(node.left)
+      if k < left_size:
+        node = node.left
+      elif k == left_size:
+        return node.datum
+      else:
+        k -= left_size + 1
+        node = node.right
+
+  def count_range(self, lo, hi):
+    """Return the number of items between lo and hi, inclusive.
+
+    Args:
+      lo: The lower bound.
+      hi: The upper bound.
+
+    Returns:
+      The number of items x where lo <= x <= hi.
+
+    Runtime:
+      O(depth) time. O(log(N)) for a balanced tree.
+    """
+    if hi < lo:
+      return 0
+    return (BST.node_rank(self.root, hi, inclusive=True) -
+            BST.node_rank(self.root, lo, inclusive=False))
+
   def delete(self, item):
     """Delete a single node that matches item. No effect if the item does not exist.
 
@@ -101,13 +595,18 @@ class BST(object):
     Returns:
       None
     """
-    self.root = BST.delete_item(self.root, item)
+    if self.is_self_balancing:
+      self.root = BST.delete_item_balanced(self.root, item)
+    else:
+      self.root = BST.delete_item(self.root, item)
 
   @staticmethod
   def delete_item(root, item):
     """Delete a single node from the root, and return the modified root.
 
-    The original root is returned if the item is not found.
+    The original root is returned if the item is not found. A node with two
+    children is replaced by its in-order successor, so the depth of the tree
+    never increases.
 
     Args:
       root: Existing node in the tree. Can be None.
@@ -115,79 +614,242 @@ class BST(object):
 
     Returns:
       The modified root node.
+
+    Runtime:
+      O(depth) time.
     """
-    if root is None:
-      return None
+    root, path = BST.splice_item(root, item)
+    BST.update_path(path)
+    return root
+
+  @staticmethod
+  def delete_item_balanced(root, item):
+    """Delete a single node from the AVL tree at root, and return the new root.
+
+    The original root is returned if the item is not found.
+
+    Args:
+      root: Existing node in the AVL tree. Can be None.
+      item: A value that can be compared to other values in the tree.
+
+    Returns:
+      The modified root node.
+
+    Runtime:
+      O(log(N)) time where N is the number of nodes in the tree.
+    """
+    root, path = BST.splice_item(root, item)
+    if len(path) == 0:
+      return root
+    return BST.rebalance_path(path)
+
+  @staticmethod
+  def splice_item(root, item):
+    """Remove a single node that matches item by splicing it out of the tree.
 
-    parent = None
+    A node with two children takes the datum of its in-order successor, and
+    the successor is removed instead. The removed node has at most one child,
+    which takes its place.
+
+    Args:
+      root: Existing node in the tree. Can be None.
+      item: A value that can be compared to other values in the tree.
+
+    Returns:
+      A tuple (root, path). root is the modified root node. path is the list
+      of nodes from the root down to the parent of the removed node, or an
+      empty list if the item was not found or the removed node was the root.
+    """
+    path = []
     node = root
-    while node.datum != item:
+    while node is not None and node.datum != item:
+      path.append(node)
       if node.datum < item:
-        parent = node
         node = node.right
-      elif item < node.datum:
-        parent = node
+      else:
         node = node.left
-      if node is None:
-        # BST did not contain item.
-        return root
+    if node is None:
+      # BST did not contain item.
+      return root, []
 
-    left = node.left
-    right = node.right
-    if parent is not None:
-      if item < parent.datum:
-        parent.left = None
-      if parent.datum < item:
-        parent.right = None
-    node_is_root = (parent is None)
-    parent = BST.insert_node(parent, right)
-    parent = BST.insert_node(parent, left)
-    if node_is_root:
-      root = parent
-    return root
+    if node.left is not None and node.right is not None:
+      path.append(node)
+      successor = node.right
+      while successor.left is not None:
+        path.append(successor)
+        successor = successor.left
+      node.datum = successor.datum
+      node = successor
 
-  def balance(self):
+    if node.left is not None:
+      child = node.left
+    else:
+      child = node.right
+    if len(path) == 0:
+      return child, []
+    parent = path[-1]
+    if parent.left is node:
+      parent.left = child
+    else:
+      parent.right = child
+    return root, path
+
+  def balance(self, rebuild=False):
     """Balance the BST to reduce the tree's depth.
 
     Preserves the BST ordering by performing tree rotations.
 
+    Args:
+      rebuild: If True, flatten the tree and rebuild it with minimal depth
+          using the Day-Stout-Warren algorithm in O(N) time and O(1) extra
+          space. Otherwise rotate nodes until no single rotation helps.
+
     Returns:
       None
     """
-    self.root = BST.balance_node(self.root)
+    if rebuild:
+      self.root = BST.rebuild_node(self.root)
+    else:
+      self.root = BST.balance_node(self.root)
 
   @staticmethod
-  def balance_node(node):
-    """Balance this node and return the new root."""
+  def rebuild_node(node):
+    """Rebuild the tree at node with minimal depth and return the new root.
+
+    Runtime:
+      O(N) time and O(1) extra space where N is the number of nodes.
+    """
     if node is None:
       return None
-    balancing = True
-    while balancing:
-      balancing = False
-      node.left = BST.balance_node(node.left)
-      node.right = BST.balance_node(node.right)
-      left_depth = BST.node_depth(node.left)
-      right_depth = BST.node_depth(node.right)
-      if left_depth >= right_depth+2:
-        outside_depth = BST.node_depth(node.left.left)
-        inside_depth = BST.node_depth(node.left.right)
-        if inside_depth > outside_depth:
-          # If the inner branch is deeper, then
-          # rotating will not help balance the depth.
-          pass
-        else:
-          node = BST.rotate_right(node)
-          balancing = True
-      elif right_depth >= left_depth+2:
-        outside_depth = BST.node_depth(node.right.right)
-        inside_depth = BST.node_depth(node.right.left)
-        if inside_depth > outside_depth:
-          # If the inner branch is deeper, then
-          # rotating will not help balance the depth.
-          pass
+    pseudo_root = BinaryTreeNode(None)
+    pseudo_root.right = node
+    size = BST.tree_to_vine(pseudo_root)
+    BST.vine_to_tree(pseudo_root, size)
+    node = pseudo_root.right
+    pseudo_root.right = None
+    BST.update_tree(node)
+    return node
+
+  @staticmethod
+  def tree_to_vine(pseudo_root):
+    """Flatten the tree under pseudo_root.right into a right-leaning vine.
+
+    Returns:
+      The number of nodes in the vine.
+    """
+    tail = pseudo_root
+    rest = tail.right
+    size = 0
+    while rest is not None:
+      if rest.left is None:
+        tail = rest
+        rest = rest.right
+        size += 1
+      else:
+        # Rotate right so the left child moves onto the vine.
+        temp = rest.left
+        rest.left = temp.right
+        temp.right = rest
+        rest = temp
+        tail.right = temp
+    return size
+
+  @staticmethod
+  def vine_to_tree(pseudo_root, size):
+    """Fold the vine under pseudo_root.right into a tree with minimal depth."""
+    full_size = (1 << (size + 1).bit_length() - 1) - 1
+    BST.compress_vine(pseudo_root, size - full_size)
+    size = full_size
+    while size > 1:
+      size = size / 2
+      BST.compress_vine(pseudo_root, size)
+
+  @staticmethod
+  def compress_vine(pseudo_root, count):
+    """Rotate left every other node along the vine, count times."""
+    scanner = pseudo_root
+    for _ in xrange(count):
+      child = scanner.right
+      scanner.right = child.right
+      scanner = scanner.right
+      child.right = scanner.left
+      scanner.left = child
+
+  @staticmethod
+  def update_tree(node):
+    """Recompute the stored height and size of every node in the tree."""
+    stack = [(node, False)]
+    while len(stack) > 0:
+      node, children_done = stack.pop()
+      if node is None:
+        continue
+      if children_done:
+        BST.update_node(node)
+      else:
+        stack.append((node, True))
+        stack.append((node.left, False))
+        stack.append((node.right, False))
+
+  @staticmethod
+  def balance_node(node):
+    """Balance this node and return the new root.
+
+    Both branches are balanced first. Then the node is rotated if that
+    helps, and the new root is balanced again. Uses an explicit stack
+    instead of recursion.
+    """
+    # Each frame is [node, state]. State 0 balances the left branch,
+    # state 1 balances the right branch, and state 2 rotates the node.
+    # The balanced root of the most recently finished frame is in result.
+    result = None
+    stack = [[node, 0]]
+    while len(stack) > 0:
+      frame = stack[-1]
+      node = frame[0]
+      if node is None:
+        result = None
+        stack.pop()
+      elif frame[1] == 0:
+        frame[1] = 1
+        stack.append([node.left, 0])
+      elif frame[1] == 1:
+        node.left = result
+        frame[1] = 2
+        stack.append([node.right, 0])
+      else:
+        node.right = result
+        BST.update_node(node)
+        new_root = BST.rotate_if_helpful(node)
+        if new_root is node:
+          result = node
+          stack.pop()
         else:
-          node = BST.rotate_left(node)
-          balancing = True
+          frame[0] = new_root
+          frame[1] = 1
+          stack.append([new_root.left, 0])
+    return result
+
+  @staticmethod
+  def rotate_if_helpful(node):
+    """Rotate node once if that reduces its depth, and return the new root."""
+    left_depth = BST.node_height(node.left)
+    right_depth = BST.node_height(node.right)
+    if left_depth >= right_depth+2:
+      outside_depth = BST.node_height(node.left.left)
+      inside_depth = BST.node_height(node.left.right)
+      if inside_depth > outside_depth:
+        # If the inner branch is deeper, then
+        # rotating will not help balance the depth.
+        return node
+      return BST.rotate_right(node)
+    elif right_depth >= left_depth+2:
+      outside_depth = BST.node_height(node.right.right)
+      inside_depth = BST.node_height(node.right.left)
+      if inside_depth > outside_depth:
+        # If the inner branch is deeper, then
+        # rotating will not help balance the depth.
+        return node
+      return BST.rotate_left(node)
     return node
 
   @staticmethod
@@ -201,6 +863,8 @@ class BST(object):
     orphan = new_root.left
     new_root.left = node
     node.right = orphan
+    BST.update_node(node)
+    BST.update_node(new_root)
     return new_root
 
   @staticmethod
@@ -214,6 +878,8 @@ class BST(object):
     orphan = new_root.right
     new_root.right= node
     node.left= orphan
+    BST.update_node(node)
+    BST.update_node(new_root)
     return new_root
 
   def depth(self):
@@ -223,16 +889,34 @@ class BST(object):
       Empty tree returns 0.
       Tree with a single node returns 1.
       Returns 1 + the max depth of the left and right branches.
+
+    Runtime:
+      Constant time O(1). Uses the height cached on the root node.
+    """
+    return BST.node_height(self.root)
+
+  def count(self):
+    """Return the number of items in the BST.
+
+    Runtime:
+      Constant time O(1). Uses the size cached on the root node.
     """
-    return BST.node_depth(self.root)
+    return BST.node_size(self.root)
 
   @staticmethod
   def node_depth(node):
-    if node is None:
-      return 0
-    left = BST.node_depth(node.left)
-    right = BST.node_depth(node.right)
-    return 1 + max(left, right)
+    """Compute the depth of the tree at node by visiting every node."""
+    depth = 0
+    stack = [(node, 1)]
+    while len(stack) > 0:
+      node, node_depth = stack.pop()
+      if node is None:
+        continue
+      if node_depth > depth:
+        depth = node_depth
+      stack.append((node.left, node_depth + 1))
+      stack.append((node.right, node_depth + 1))
+    return depth
 
   def is_valid(self):
     """Validate the binary search tree.
@@ -258,19 +942,379 @@ class BST(object):
     Returns:
       True if this node and all subnodes are valid binary search tree nodes.
     """
+    stack = [(node, mn, mx)]
+    while len(stack) > 0:
+      node, mn, mx = stack.pop()
+      if node is None:
+        continue
+      if mn is not None and node.datum < mn:
+        return False
+      if mx is not None and node.datum > mx:
+        return False
+      stack.append((node.right, node.datum, mx))
+      stack.append((node.left, mn, node.datum))
+    return True
+
+  def __iter__(self):
+    return self.in_order()
+
+  def in_order(self):
+    """Generate the items in sorted order."""
+    for node in BST.in_order_nodes(self.root):
+      yield node.datum
+
+  def pre_order(self):
+    """Generate the items with each node before its left and right branches."""
+    for node in BST.pre_order_nodes(self.root):
+      yield node.datum
+
+  def post_order(self):
+    """Generate the items with each node after its left and right branches."""
+    for node in BST.post_order_nodes(self.root):
+      yield node.datum
+
+  def level_order(self):
+    """Generate the items one level at a time, starting from the root."""
+    for node in BST.level_order_nodes(self.root):
+      yield node.datum
+
+  @staticmethod
+  def in_order_nodes(node):
+    """Generate the nodes of the tree at node in sorted order.
+
+    Holds O(depth) nodes on an explicit stack.
+    """
+    stack = []
+    while node is not None or len(stack) > 0:
+      while node is not None:
+        stack.append(node)
+        node = node.left
+      node = stack.pop()
+      yield node
+      node = node.right
+
+  @staticmethod
+  def pre_order_nodes(node):
+    """Generate the nodes of the tree at node in pre-order."""
+    stack = [node]
+    while len(stack) > 0:
+      node = stack.pop()
+      if node is None:
+        continue
+      yield node
+      stack.append(node.right)
+      stack.append(node.left)
+
+  @staticmethod
+  def post_order_nodes(node):
+    """Generate the nodes of the tree at node in post-order."""
+    stack = [(node, False)]
+    while len(stack) > 0:
+      node, children_done = stack.pop()
+      if node is None:
+        continue
+      if children_done:
+        yield node
+      else:
+        stack.append((node, True))
+        stack.append((node.right, False))
+        stack.append((node.left, False))
+
+  @staticmethod
+  def level_order_nodes(node):
+    """Generate the nodes of the tree at node in level order."""
     if node is None:
-      return True
+      return
+    queue = collections.deque([node])
+    while len(queue) > 0:
+      node = queue.popleft()
+      yield node
+      if node.left is not None:
+        queue.append(node.left)
+      if node.right is not None:
+        queue.append(node.right)
+
+
+class ArrayBST(object):
+  """Self-balancing binary search tree stored as a struct of arrays.
+
+  Supports the same insert(), find(), delete(), depth(), count(), rank(),
+  select(), count_range(), is_valid() and in_order() operations as
+  BST(self_balancing=True), but does not allocate an object per node.
+
+  Node i is stored at index i of each array. Index 0 is a sentinel for an
+  empty branch with height and size 0, so children never need a None check.
+  Deleted indexes are kept in a free list, linked through the left array,
+  and reused by later inserts.
+
+  Attributes:
+    keys: List of items. keys[i] is the datum of node i.
+    left: Array of left child indexes.
+    right: Array of right child indexes.
+    height: Array of subtree heights.
+    size: Array of subtree sizes.
+    root: Index of the root node. 0 if the tree is empty.
+  """
+
+  def __init__(self):
+    self.keys = [None] # Index 0 is the empty branch sentinel.
+    self.left = array.array('l', [0])
+    self.right = array.array('l', [0])
+    self.height = array.array('l', [0])
+    self.size = array.array('l', [0])
+    self.root = 0
+    self.free_index = 0
+
+  def __iter__(self):
+    return self.in_order()
+
+  def new_index(self, item):
+    """Store item in an unused index and return the index."""
+    index = self.free_index
+    if index == 0:
+      index = len(self.keys)
+      self.keys.append(item)
+      self.left.append(0)
+      self.right.append(0)
+      self.height.append(1)
+      self.size.append(1)
+      return index
+    self.free_index = self.left[index]
+    self.keys[index] = item
+    self.left[index] = 0
+    self.right[index] = 0
+    self.height[index] = 1
+    self.size[index] = 1
+    return index
+
+  def free(self, index):
+    """Release index so that it can be reused by a later insert."""
+    self.keys[index] = None
+    self.left[index] = self.free_index
+    self.right[index] = 0
+    self.free_index = index
+
+  def update(self, index):
+    """Recompute the stored height and size of index from its children."""
+    left = self.left[index]
+    right = self.right[index]
+    self.height[index] = 1 + max(self.height[left], self.height[right])
+    self.size[index] = 1 + self.size[left] + self.size[right]
+
+  def rotate_left(self, index):
+    new_root = self.right[index]
+    self.right[index] = self.left[new_root]
+    self.left[new_root] = index
+    self.update(index)
+    self.update(new_root)
+    return new_root
+
+  def rotate_right(self, index):
+    new_root = self.left[index]
+    self.left[index] = self.right[new_root]
+    self.right[new_root] = index
+    self.update(index)
+    self.update(new_root)
+    return new_root
+
+  def rebalance(self, index):
+    """Restore the AVL property for index and return the new root index."""
+    self.update(index)
+    left = self.left[index]
+    right = self.right[index]
+    height = self.height
+    if height[left] >= height[right] + 2:
+      if height[self.left[left]] < height[self.right[left]]:
+        self.left[index] = self.rotate_left(left)
+      index = self.rotate_right(index)
+    elif height[right] >= height[left] + 2:
+      if height[self.right[right]] < height[self.left[right]]:
+        self.right[index] = self.rotate_right(right)
+      index = self.rotate_left(index)
+    return index
+
+  def rebalance_path(self, path):
+    """Rebalance every index on a path from the root, deepest first."""
+    new_root = 0
+    for i in xrange(len(path) - 1, -1, -1):
+      index = path[i]
+      new_root = self.rebalance(index)
+      if i > 0:
+        parent = path[i - 1]
+        if self.left[parent] == index:
+          self.left[parent] = new_root
+        else:
+          self.right[parent] = new_root
+    self.root = new_root
+
+  def insert(self, item):
+    """Inserts an item into the tree.
+
+    Runtime:
+      O(log(N)) time where N is the number of items in the tree.
+    """
+    new_index = self.new_index(item)
+    if self.root == 0:
+      self.root = new_index
+      return
+    keys = self.keys
+    path = []
+    index = self.root
+    while index != 0:
+      path.append(index)
+      if keys[index] < item:
+        index = self.right[index]
+      else:
+        index = self.left[index]
+    parent = path[-1]
+    if keys[parent] < item:
+      self.right[parent] = new_index
+    else:
+      self.left[parent] = new_index
+    self.rebalance_path(path)
+
+  def find_index(self, item):
+    """Returns the index that matches the item, or 0 if it does not exist."""
+    keys = self.keys
+    index = self.root
+    while index != 0:
+      datum = keys[index]
+      if datum == item:
+        return index
+      elif datum < item:
+        index = self.right[index]
+      else:
+        index = self.left[index]
+    return 0
+
+  def find(self, item):
+    """Returns the stored item that matches item, or None if it does not exist.
+
+    Runtime:
+      O(log(N)) time where N is the number of items in the tree.
+    """
+    return self.keys[self.find_index(item)]
 
-    if mn is not None and node.datum < mn:
+  def delete(self, item):
+    """Delete a single item. No effect if the item does not exist.
+
+    Runtime:
+      O(log(N)) time where N is the number of items in the tree.
+    """
+    keys = self.keys
+    path = []
+    index = self.root
+    while index != 0 and keys[index] != item:
+      path.append(index)
+      if keys[index] < item:
+        index = self.right[index]
+      else:
+        index = self.left[index]
+    if index == 0:
+      return
+
+    if self.left[index] != 0 and self.right[index] != 0:
+      path.append(index)
+      successor = self.right[index]
+      while self.left[successor] != 0:
+        path.append(successor)
+        successor = self.left[successor]
+      keys[index] = keys[successor]
+      index = successor
+
+    if self.left[index] != 0:
+      child = self.left[index]
+    else:
+      child = self.right[index]
+    self.free(index)
+    if len(path) == 0:
+      self.root = child
+      return
+    parent = path[-1]
+    if self.left[parent] == index:
+      self.left[parent] = child
+    else:
+      self.right[parent] = child
+    self.rebalance_path(path)
+
+  def depth(self):
+    """Return the depth of the tree in constant time."""
+    return self.height[self.root]
+
+  def count(self):
+    """Return the number of items in the tree in constant time."""
+    return self.size[self.root]
+
+  def rank(self, item, inclusive=False):
+    """Return the number of items in the tree that are less than item.
+
+    Args:
+      item: A value that can be compared to other values in the tree.
+      inclusive: If True, items equal to item are counted as well.
+    """
+    keys = self.keys
+    rank = 0
+    index = self.root
+    while index != 0:
+      datum = keys[index]
+      if datum < item or (inclusive and datum == item):
+        rank += self.size[self.left[index]] + 1
+        index = self.right[index]
+      else:
+        index = self.left[index]
+    return rank
+
+  def select(self, k):
+    """Return the item with rank k, i.e. the (k+1)th smallest item."""
+    if k < 0 or k >= self.count():
+      raise ValueError('Cannot select index %d from %d items' % (k,
+          self.count()))
+    index = self.root
+    while True:
+      left_size = self.size[self.left[index]]
+      if k < left_size:
+        index = self.left[index]
+      elif k == left_size:
+        return self.keys[index]
+      else:
+        k -= left_size + 1
+        index = self.right[index]
+
+  def count_range(self, lo, hi):
+    """Return the number of items x where lo <= x <= hi."""
+    if hi < lo:
+      return 0
+    return self.rank(hi, inclusive=True) - self.rank(lo)
+
+  def is_valid(self):
+    """Validate the ordering of the binary search tree."""
+    keys = self.keys
+    stack = [(self.root, None, None)]
+    while len(stack) > 0:
+      index, mn, mx = stack.pop()
+      if index == 0:
+        continue
+      datum = keys[index]
+      if mn is not None and datum < mn:
         return False
-    if mx is not None and node.datum > mx:
+      if mx is not None and datum > mx:
         return False
-    if not BST.is_valid_node(node.left, mn, node.datum):
-      return False
-    if not BST.is_valid_node(node.right, node.datum, mx):
-      return False
+      stack.append((self.right[index], datum, mx))
+      stack.append((self.left[index], mn, datum))
     return True
 
+  def in_order(self):
+    """Generate the items in sorted order."""
+    stack = []
+    index = self.root
+    while index != 0 or len(stack) > 0:
+      while index != 0:
+        stack.append(index)
+        index = self.left[index]
+      index = stack.pop()
+      yield self.keys[index]
+      index = self.right[index]
+
 
 class TestBST(unittest.TestCase):
   """Test cases for the BST."""
@@ -344,6 +1388,80 @@ class TestBST(unittest.TestCase):
     self.assertIsNone(result)
     self.assertTrue(bst.is_valid())
 
+  def test_delete_does_not_increase_depth(self):
+    rng = random.Random(4)
+    bst = BST()
+    data = range(200)
+    rng.shuffle(data)
+    for item in data:
+      bst.insert(item)
+    rng.shuffle(data)
+    for item in data:
+      depth = bst.depth()
+      bst.delete(item)
+      self.assertLessEqual(bst.depth(), depth)
+      self.assertTrue(bst.is_valid())
+    self.assertIsNone(bst.root)
+
+  def test_from_sorted(self):
+    for size in xrange(0, 70):
+      bst = BST.from_sorted(iter(xrange(size)))
+      self.assertEqual(bst.count(), size)
+      self.assertEqual(bst.depth(), (size).bit_length())
+      self.assertEqual(list(bst), range(size))
+      self.assertTrue(bst.is_valid())
+
+  def test_from_sorted_unsorted_input(self):
+    self.assertRaises(ValueError, BST.from_sorted, [1, 3, 2])
+
+  def test_from_iterable(self):
+    data = [5, 1, 4, 1, 3, 9, 2]
+    bst = BST.from_iterable(data, self_balancing=True)
+    self.assertTrue(bst.is_self_balancing)
+    self.assertEqual(list(bst), sorted(data))
+    self.assertEqual(bst.depth(), 3)
+    self.assertTrue(bst.is_valid())
+    bst.insert(0)
+    bst.delete(4)
+    self.assertEqual(list(bst), [0, 1, 1, 2, 3, 5, 9])
+
+  def test_insert_many(self):
+    rng = random.Random(8)
+    for self_balancing in (False, True):
+      bst = BST(self_balancing=self_balancing)
+      expected = []
+      for size in (0, 1, 10, 5, 100, 20, 300):
+        batch = [rng.randint(0, 100) for _ in xrange(size)]
+        bst.insert_many(iter(batch))
+        expected.extend(batch)
+        self.assertEqual(list(bst), sorted(expected))
+        self.assertEqual(bst.count(), len(expected))
+        self.assertEqual(bst.depth(), BST.node_depth(bst.root))
+        self.assertTrue(bst.is_valid())
+
+  def test_insert_many_self_balancing(self):
+    bst = BST(self_balancing=True)
+    bst.insert_many(xrange(100))
+    bst.insert_many(xrange(100, 110))
+    bst.insert_many(xrange(110, 300))
+    self.assertEqual(list(bst), range(300))
+    self.assertLessEqual(bst.depth(), 10)
+
+  def test_find_many(self):
+    rng = random.Random(9)
+    bst = BST()
+    for _ in xrange(100):
+      bst.insert(rng.randint(0, 100))
+    batch = [rng.randint(-10, 110) for _ in xrange(300)]
+    results = bst.find_many(iter(batch))
+    self.assertEqual(len(results), len(batch))
+    for item, result in zip(batch, results):
+      if bst.find(item) is None:
+        self.assertIsNone(result)
+      else:
+        self.assertEqual(result.datum, item)
+    self.assertEqual(BST().find_many([1, 2]), [None, None])
+
   def test_depth(self):
     bst = BST()
     bst.insert(15)
@@ -351,6 +1469,41 @@ class TestBST(unittest.TestCase):
     bst.insert(17)
     self.assertEqual(bst.depth(), 3)
 
+  def test_count(self):
+    bst = BST()
+    self.assertEqual(bst.count(), 0)
+    bst.insert(2)
+    bst.insert(1)
+    bst.insert(3)
+    self.assertEqual(bst.count(), 3)
+    bst.delete(2)
+    self.assertEqual(bst.count(), 2)
+    bst.delete(4)
+    self.assertEqual(bst.count(), 2)
+
+  def test_cached_height_and_size(self):
+    rng = random.Random(2)
+    bst = BST()
+    for _ in xrange(500):
+      item = rng.randint(0, 100)
+      if rng.random() < 0.6:
+        bst.insert(item)
+      else:
+        bst.delete(item)
+    bst.balance()
+    self.assertEqual(bst.depth(), BST.node_depth(bst.root))
+    self.assertCachedMetadata(bst.root)
+
+  def assertCachedMetadata(self, node):
+    """Assert the cached height and size of every node are correct."""
+    if node is None:
+      return
+    self.assertCachedMetadata(node.left)
+    self.assertCachedMetadata(node.right)
+    self.assertEqual(node.height, BST.node_depth(node))
+    self.assertEqual(node.size, 1 + BST.node_size(node.left) +
+                     BST.node_size(node.right))
+
   def test_balance(self):
     bst = BST()
     bst.insert(18)
@@ -373,6 +1526,281 @@ class TestBST(unittest.TestCase):
     bst.balance()
     self.assertEqual(bst.depth(), 3)
 
+  def test_rebuild(self):
+    bst = BST()
+    for i in xrange(18, 24):
+      bst.insert(i)
+    self.assertEqual(bst.depth(), 6)
+    bst.balance(rebuild=True)
+    self.assertEqual(bst.depth(), 3)
+    self.assertTrue(bst.is_valid())
+    for i in xrange(18, 24):
+      self.assertEqual(bst.find(i).datum, i)
+
+  def test_rebuild_inner_branch(self):
+    """Rebuilding can balance trees that rotations alone cannot."""
+    bst = BST()
+    bst.insert(18)
+    bst.insert(20)
+    bst.insert(19)
+    bst.balance(rebuild=True)
+    self.assertEqual(bst.depth(), 2)
+    self.assertTrue(bst.is_valid())
+
+  def test_rebuild_sizes(self):
+    for size in xrange(0, 70):
+      bst = BST()
+      data = list(xrange(size))
+      random.Random(size).shuffle(data)
+      for item in data:
+        bst.insert(item)
+      bst.balance(rebuild=True)
+      self.assertEqual(bst.depth(), (size).bit_length())
+      self.assertTrue(bst.is_valid())
+
+  def test_rank_select_and_count_range(self):
+    rng = random.Random(3)
+    for self_balancing in (False, True):
+      bst = BST(self_balancing=self_balancing)
+      data = [rng.randint(0, 50) for _ in xrange(200)]
+      for item in data:
+        bst.insert(item)
+      data.sort()
+      for k in xrange(len(data)):
+        self.assertEqual(bst.select(k), data[k])
+      for item in xrange(-1, 53):
+        self.assertEqual(bst.rank(item), len([x for x in data if x < item]))
+      for lo in xrange(-1, 53, 3):
+        for hi in xrange(-1, 53, 5):
+          expected = len([x for x in data if lo <= x <= hi])
+          self.assertEqual(bst.count_range(lo, hi), expected)
+
+  def test_ordered_queries(self):
+    rng = random.Random(6)
+    data = [rng.randint(0, 50) * 2 for _ in xrange(100)]
+    bst = BST()
+    for item in data:
+      bst.insert(item)
+    for item in xrange(-2, 104):
+      lower = [x for x in data if x <= item]
+      self.assertEqual(bst.floor(item), max(lower) if lower else None)
+      lower = [x for x in data if x < item]
+      self.assertEqual(bst.predecessor(item), max(lower) if lower else None)
+      higher = [x for x in data if x >= item]
+      self.assertEqual(bst.ceiling(item), min(higher) if higher else None)
+      higher = [x for x in data if x > item]
+      self.assertEqual(bst.successor(item), min(higher) if higher else None)
+
+  def test_iter_range(self):
+    rng = random.Random(7)
+    data = [rng.randint(0, 50) for _ in xrange(100)]
+    bst = BST()
+    for item in data:
+      bst.insert(item)
+    data.sort()
+    for lo in xrange(-1, 53, 3):
+      for hi in xrange(-1, 53, 5):
+        expected = [x for x in data if lo <= x <= hi]
+        self.assertEqual(list(bst.iter_range(lo, hi)), expected)
+    self.assertEqual(list(bst.iter_range()), data)
+    self.assertEqual(list(bst.iter_range(lo=40)), [x for x in data if x >= 40])
+    self.assertEqual(list(bst.iter_range(hi=10)), [x for x in data if x <= 10])
+
+  def test_select_out_of_range(self):
+    bst = BST()
+    self.assertRaises(ValueError, bst.select, 0)
+    bst.insert(1)
+    self.assertEqual(bst.select(0), 1)
+    self.assertRaises(ValueError, bst.select, 1)
+    self.assertRaises(ValueError, bst.select, -1)
+
+  def test_traversals(self):
+    bst = BST()
+    for item in [4, 2, 6, 1, 3, 5, 7]:
+      bst.insert(item)
+    self.assertEqual(list(bst), [1, 2, 3, 4, 5, 6, 7])
+    self.assertEqual(list(bst.in_order()), [1, 2, 3, 4, 5, 6, 7])
+    self.assertEqual(list(bst.pre_order()), [4, 2, 1, 3, 6, 5, 7])
+    self.assertEqual(list(bst.post_order()), [1, 3, 2, 5, 7, 6, 4])
+    self.assertEqual(list(bst.level_order()), [4, 2, 6, 1, 3, 5, 7])
+
+  def test_traversals_empty(self):
+    bst = BST()
+    self.assertEqual(list(bst.in_order()), [])
+    self.assertEqual(list(bst.pre_order()), [])
+    self.assertEqual(list(bst.post_order()), [])
+    self.assertEqual(list(bst.level_order()), [])
+
+  def test_deep_tree(self):
+    """Trees deeper than the recursion limit do not crash."""
+    size = sys.getrecursionlimit() + 100
+    root = None
+    for item in xrange(size - 1, -1, -1):
+      node = BinaryTreeNode(item)
+      node.right = root
+      root = node
+    BST.update_tree(root)
+    bst = BST()
+    bst.root = root
+    self.assertEqual(bst.depth(), size)
+    self.assertEqual(BST.node_depth(bst.root), size)
+    self.assertTrue(bst.is_valid())
+    self.assertEqual(list(bst), range(size))
+    self.assertEqual(list(bst.pre_order()), range(size))
+    self.assertEqual(list(bst.post_order()), range(size - 1, -1, -1))
+    self.assertEqual(list(bst.level_order()), range(size))
+    self.assertEqual(len(str(bst).splitlines()), 2 * size - 1)
+    bst.balance()
+    self.assertTrue(bst.is_valid())
+    self.assertLess(bst.depth(), size)
+    self.assertEqual(list(bst), range(size))
+
+
+class TestSelfBalancingBST(unittest.TestCase):
+  """Test cases for the self-balancing BST."""
+
+  def assertAVL(self, node):
+    """Assert the AVL property and stored heights, and return the height."""
+    if node is None:
+      return 0
+    left = self.assertAVL(node.left)
+    right = self.assertAVL(node.right)
+    self.assertLessEqual(abs(left - right), 1)
+    self.assertEqual(node.height, 1 + max(left, right))
+    self.assertEqual(node.size, 1 + BST.node_size(node.left) +
+                     BST.node_size(node.right))
+    return node.height
+
+  def test_sorted_inserts(self):
+    bst = BST(self_balancing=True)
+    for i in xrange(1023):
+      bst.insert(i)
+    self.assertTrue(bst.is_valid())
+    self.assertEqual(bst.depth(), 10)
+    self.assertAVL(bst.root)
+    for i in xrange(1023):
+      self.assertEqual(bst.find(i).datum, i)
+
+  def test_reverse_sorted_inserts(self):
+    bst = BST(self_balancing=True)
+    for i in xrange(1000, 0, -1):
+      bst.insert(i)
+    self.assertTrue(bst.is_valid())
+    self.assertAVL(bst.root)
+
+  def test_delete(self):
+    bst = BST(self_balancing=True)
+    for i in xrange(100):
+      bst.insert(i)
+    for i in xrange(0, 100, 2):
+      bst.delete(i)
+    self.assertTrue(bst.is_valid())
+    self.assertAVL(bst.root)
+    for i in xrange(100):
+      if i % 2 == 0:
+        self.assertIsNone(bst.find(i))
+      else:
+        self.assertEqual(bst.find(i).datum, i)
+
+  def test_delete_item_that_does_not_exist(self):
+    bst = BST(self_balancing=True)
+    bst.insert(1)
+    bst.delete(2)
+    self.assertEqual(bst.find(1).datum, 1)
+
+  def test_random_operations(self):
+    rng = random.Random(1)
+    bst = BST(self_balancing=True)
+    expected = []
+    for _ in xrange(2000):
+      item = rng.randint(0, 200)
+      if rng.random() < 0.6:
+        bst.insert(item)
+        expected.append(item)
+      elif item in expected:
+        bst.delete(item)
+        expected.remove(item)
+      self.assertTrue(bst.is_valid())
+    self.assertAVL(bst.root)
+    for item in expected:
+      self.assertEqual(bst.find(item).datum, item)
+
+  def test_rebuild(self):
+    bst = BST(self_balancing=True)
+    for i in xrange(100):
+      bst.insert(i)
+    bst.balance(rebuild=True)
+    self.assertEqual(bst.depth(), 7)
+    self.assertAVL(bst.root)
+    bst.insert(100)
+    self.assertAVL(bst.root)
+
+
+class TestArrayBST(unittest.TestCase):
+  """Test cases for the array-backed BST."""
+
+  def test_empty(self):
+    bst = ArrayBST()
+    self.assertTrue(bst.is_valid())
+    self.assertEqual(bst.depth(), 0)
+    self.assertEqual(bst.count(), 0)
+    self.assertIsNone(bst.find(1))
+    self.assertEqual(list(bst), [])
+
+  def test_insert_find_and_delete(self):
+    bst = ArrayBST()
+    bst.insert(13)
+    bst.insert(12)
+    bst.insert(14)
+    self.assertEqual(bst.find(13), 13)
+    bst.delete(13)
+    self.assertIsNone(bst.find(13))
+    self.assertEqual(list(bst), [12, 14])
+    self.assertTrue(bst.is_valid())
+
+  def test_sorted_inserts(self):
+    bst = ArrayBST()
+    for i in xrange(1023):
+      bst.insert(i)
+    self.assertEqual(bst.depth(), 10)
+    self.assertEqual(bst.count(), 1023)
+    self.assertTrue(bst.is_valid())
+
+  def test_reuses_deleted_indexes(self):
+    bst = ArrayBST()
+    for i in xrange(100):
+      bst.insert(i)
+    for i in xrange(100):
+      bst.delete(i)
+    self.assertEqual(bst.count(), 0)
+    for i in xrange(100):
+      bst.insert(i)
+    self.assertEqual(len(bst.keys), 101)
+    self.assertEqual(list(bst), range(100))
+
+  def test_matches_bst(self):
+    rng = random.Random(5)
+    bst = BST(self_balancing=True)
+    array_bst = ArrayBST()
+    for _ in xrange(2000):
+      item = rng.randint(0, 200)
+      if rng.random() < 0.6:
+        bst.insert(item)
+        array_bst.insert(item)
+      else:
+        bst.delete(item)
+        array_bst.delete(item)
+    self.assertTrue(array_bst.is_valid())
+    self.assertEqual(list(array_bst), list(bst))
+    self.assertEqual(array_bst.depth(), bst.depth())
+    self.assertEqual(array_bst.count(), bst.count())
+    for k in xrange(bst.count()):
+      self.assertEqual(array_bst.select(k), bst.select(k))
+    for item in xrange(0, 201, 7):
+      self.assertEqual(array_bst.rank(item), bst.rank(item))
+      self.assertEqual(array_bst.count_range(item, item + 20),
+                       bst.count_range(item, item + 20))
+
 
 if __name__ == '__main__':
   unittest.main()
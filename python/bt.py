@@ -21,12 +21,23 @@ class BinaryTreeNode(object):
     datum: A value that can be compared to other values in the tree.
     left: The BinaryTreeNode for the left branch.
     right: the BinaryTreeNode for the right branch.
+    height: The height of the subtree rooted at this node. A leaf has height 1.
+    size: The number of nodes in the subtree rooted at this node.
+
+  Trees that modify nodes are responsible for keeping height and size up to
+  date. They are cached so that depth and rank queries do not need to visit
+  every node.
   """
 
+  # Avoid a per-node __dict__. Trees can hold millions of nodes.
+  __slots__ = ('datum', 'left', 'right', 'height', 'size')
+
   def __init__(self, datum):
     self.datum = datum
     self.left = None
     self.right = None
+    self.height = 1
+    self.size = 1
 
   def __str__(self):
     return self.pretty_str()
@@ -40,21 +51,24 @@ class BinaryTreeNode(object):
 
     Returns:
       A string that can be printed to the command line."""
-    output = ''
-    if self.right is not None:
-      output += self.right.pretty_str(indent+2)
-      output += '\n'
-      output += ' ' * indent
-      output += ' /'
-      output += '\n'
-    output += ' ' * indent
-    output += '-' + str(self.datum)
-    if self.left is not None:
-      output += '\n'
-      output += ' ' * indent
-      output += ' \\\n'
-      output += self.left.pretty_str(indent+2)
-    return output
+    output = []
+    # The stack holds strings to output and (node, indent) pairs to expand.
+    # Items are pushed in reverse so the right branch is printed first.
+    stack = [(self, indent)]
+    while len(stack) > 0:
+      item = stack.pop()
+      if isinstance(item, str):
+        output.append(item)
+        continue
+      node, indent = item
+      if node.left is not None:
+        stack.append((node.left, indent+2))
+        stack.append('\n' + ' ' * indent + ' \\\n')
+      stack.append(' ' * indent + '-' + str(node.datum))
+      if node.right is not None:
+        stack.append('\n' + ' ' * indent + ' /' + '\n')
+        stack.append((node.right, indent+2))
+    return ''.join(output)
 
 
 class TestBTN(unittest.TestCase):
@@ -68,6 +82,7 @@ class TestBTN(unittest.TestCase):
     self.assertIsNone(node.left)
     self.assertIsNone(node.right)
     self.assertEqual(node.datum, 1)
+    self.assertFalse(hasattr(node, '__dict__'))
 
   def test_left(self):
     node = BinaryTreeNode('Root Node')
@@ -93,6 +108,28 @@ class TestBTN(unittest.TestCase):
     self.assertEqual(node.left.datum, 0)
     self.assertEqual(node.right.datum, True)
 
+  def test_pretty_str(self):
+    node = BinaryTreeNode(2)
+    node.left = BinaryTreeNode(1)
+    node.right = BinaryTreeNode(3)
+    node.right.right = BinaryTreeNode(4)
+    self.assertEqual(str(node), '\n'.join([
+        '    -4',
+        '   /',
+        '  -3',
+        ' /',
+        '-2',
+        ' \\',
+        '  -1']))
+
+  def test_deep_pretty_str(self):
+    node = BinaryTreeNode(0)
+    for i in xrange(1, 5000):
+      parent = BinaryTreeNode(i)
+      parent.left = node
+      node = parent
+    self.assertEqual(len(node.pretty_str().splitlines()), 2 * 5000 - 1)
+
 
 if __name__ == '__main__':
   unittest.main()
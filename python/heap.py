@@ -12,6 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import itertools
+import random
+import threading
+import time
 import unittest
 
 class Heap(object):
@@ -22,22 +26,80 @@ class Heap(object):
   Items are inserted with Heap.insert().
   The top item can be viewed with Heap.peek().
   The top item can be removed with Heap.pop().
+
+  Items are compared directly by default. Use Heap(key=func) to compare
+  func(item) instead.
+
+  Use Heap(addressable=True) to track the position of every item. Items must
+  be hashable and unique. Each item has a priority, which defaults to the key
+  of the item, and can be changed with Heap.update(). Items can be removed
+  with Heap.remove() and looked up with Heap.contains().
+
+  Binary by default. Use Heap(arity=d) to give every node d children. A
+  larger arity makes the tree shallower, so inserts are cheaper, but each
+  step of a pop compares more children.
+
+  Unbounded by default. Use Heap(capacity=k) to keep at most k items. When
+  the heap is full, insert() drops whichever of the new item and the top
+  item comes first in heap order, so a bounded min heap keeps the k largest
+  items and a bounded max heap keeps the k smallest.
   """
 
-  def __init__(self, max_heap=False):
+  def __init__(self, max_heap=False, key=None, addressable=False, arity=2,
+               capacity=None):
+    if arity < 2:
+      raise ValueError('Arity must be at least 2, not %d' % arity)
+    if capacity is not None and capacity < 0:
+      raise ValueError('Capacity cannot be negative, not %d' % capacity)
     self.items = [None] # Index 0 is unused for easier math.
     self.item_count = 0
-    self.invalid_index_set = set()
+    self.arity = arity
+    self.capacity = capacity
     self.is_max_heap = max_heap
+    self.item_key = key
+    self.key = key
+    self.positions = None
+    self.priorities = None
+    if addressable:
+      self.positions = {}
+      self.priorities = {}
+      self.key = self.priorities.__getitem__
+
+  @classmethod
+  def from_iterable(cls, items, max_heap=False, key=None, addressable=False,
+                    arity=2, capacity=None):
+    """Build a heap from items in O(N) time.
+
+    Args:
+      items: Iterable of values that can be compared to each other.
+      max_heap: Passed to the Heap constructor.
+      key: Passed to the Heap constructor.
+      addressable: Passed to the Heap constructor.
+      arity: Passed to the Heap constructor.
+      capacity: Passed to the Heap constructor.
+
+    Returns:
+      A new Heap.
+
+    Runtime:
+      O(N) time where N is the number of items. O(N*log(K)) time for a heap
+      with capacity K.
+    """
+    heap = cls(max_heap=max_heap, key=key, addressable=addressable,
+               arity=arity, capacity=capacity)
+    heap.push_many(items)
+    return heap
 
   def __str__(self):
-    return 'Count: %d, Items: %s, Invalid Index Set: %s' % (self.count(),
-        str(self.items), self.invalid_index_set)
+    return 'Count: %d, Items: %s' % (self.count(), str(self.items))
 
   def count(self):
     return self.item_count
 
   def is_heap_order(self, parent, child):
+    if self.key is not None:
+      parent = self.key(parent)
+      child = self.key(child)
     if self.is_max_heap:
       # Max heap.
       return parent >= child
@@ -45,11 +107,13 @@ class Heap(object):
       # Min heap.
       return parent <= child
 
-  def insert(self, item):
+  def insert(self, item, priority=None):
     """Insert an item into the min heap.
 
     Args:
       item: A value that can be compared to other values in the heap.
+      priority: Only for addressable heaps. The priority of the item. None to
+          use the key of the item.
 
     Returns:
       None
@@ -57,32 +121,195 @@ class Heap(object):
     Runtime:
       O(log(N)) time where N is the number of items in the heap.
     """
-    index = self.insert_at_next_index(item)
-    self.items[index] = item
+    if self.capacity is not None and self.item_count >= self.capacity:
+      self.pushpop(item, priority)
+      return
+    self.append(item, priority)
+    self.sift_up(self.item_count)
+
+  def pushpop(self, item, priority=None):
+    """Insert an item, then remove and return the top item.
+
+    Faster than insert() followed by pop(). If the item comes first in heap
+    order, it is returned without touching the heap.
+
+    Args:
+      item: A value that can be compared to other values in the heap.
+      priority: Only for addressable heaps. The priority of the item. None to
+          use the key of the item.
+
+    Returns:
+      The top item.
+
+    Runtime:
+      O(log(N)) time where N is the number of items in the heap.
+    """
+    if self.positions is not None:
+      self.append(item, priority)
+      self.sift_up(self.item_count)
+      return self.pop()
+    if priority is not None:
+      raise ValueError('Priorities are only supported by addressable heaps')
+    if self.item_count == 0 or self.is_heap_order(item, self.items[1]):
+      return item
+    result = self.items[1]
+    self.items[1] = item
+    self.sift_down(1)
+    return result
+
+  def replace(self, item):
+    """Remove and return the top item, then insert an item.
+
+    Faster than pop() followed by insert(). The returned item may come
+    after the new item in heap order.
+
+    Args:
+      item: A value that can be compared to other values in the heap.
+
+    Returns:
+      The top item before the new item was inserted.
+
+    Runtime:
+      O(log(N)) time where N is the number of items in the heap.
+    """
+    result = self.peek()
+    if self.positions is not None:
+      self.pop()
+      self.insert(item)
+      return result
+    self.items[1] = item
+    self.sift_down(1)
+    return result
+
+  def append(self, item, priority=None):
+    """Add an item to the end of the items without restoring heap order."""
+    if self.positions is not None:
+      if item in self.positions:
+        raise ValueError('Item is already in the heap: %r' % (item,))
+      if priority is None:
+        if self.item_key is None:
+          priority = item
+        else:
+          priority = self.item_key(item)
+      self.priorities[item] = priority
+      self.positions[item] = len(self.items)
+    elif priority is not None:
+      raise ValueError('Priorities are only supported by addressable heaps')
+    self.items.append(item)
+    self.item_count += 1
+
+  def extend(self, items):
+    """Add items to the end of the items without restoring heap order."""
+    if self.positions is None:
+      self.items.extend(items)
+      self.item_count = len(self.items) - 1
+    else:
+      for item in items:
+        self.append(item)
+
+  def push_many(self, items):
+    """Insert a batch of items.
+
+    Small batches are inserted one at a time. When the batch is at least as
+    large as the heap, the items are appended and the whole heap is rebuilt
+    with heapify(), which is cheaper than K separate inserts.
+
+    Args:
+      items: Iterable of values that can be compared to values in the heap.
+
+    Returns:
+      None
+
+    Runtime:
+      O(min(K*log(N+K), N+K)) time for K items.
+    """
+    items = list(items)
+    if self.capacity is not None or len(items) < self.item_count:
+      for item in items:
+        self.insert(item)
+      return
+    self.extend(items)
+    self.heapify()
+
+  def heapify(self):
+    """Restore heap order for all items with Floyd's bottom-up method.
+
+    Runtime:
+      O(N) time where N is the number of items in the heap.
+    """
+    last_parent = self.parent_index(self.item_count)
+    for index in xrange(last_parent, 0, -1):
+      self.sift_down(index)
+
+  def parent_index(self, index):
+    """Return the index of the parent of index. The root has parent 0."""
+    # Truncate, e.g. with arity 2, 4 and 5 have parent 2.
+    return (index - 2) / self.arity + 1
+
+  def first_child_index(self, index):
+    """Return the index of the first child of index."""
+    return self.arity * (index - 1) + 2
+
+  def sift_up(self, index):
+    """Move the item at index up until its parent is in heap order.
+
+    Runtime:
+      O(log_d(N)) time where N is the number of items in the heap and d is
+      the arity.
+    """
+    items = self.items
+    positions = self.positions
+    arity = self.arity
+    item = items[index]
     while index > 1:
-      parent_index = index / 2 # Truncate, e.g. 4 and 5 have parent 2.
-      if self.is_heap_order(self.items[parent_index], self.items[index]):
+      parent_index = (index - 2) / arity + 1 # Same as parent_index().
+      parent = items[parent_index]
+      if self.is_heap_order(parent, item):
         # The item does not need to bubble up anymore. Done.
-        return
-      else:
-        # Swap items at index and parent_index
-        temp = self.items[index]
-        self.items[index] = self.items[parent_index]
-        self.items[parent_index] = temp
-        index = parent_index
-    # The item bubbled all the way to the root. Done.
-    return
+        break
+      # Move the parent down into the hole.
+      items[index] = parent
+      if positions is not None:
+        positions[parent] = index
+      index = parent_index
+    items[index] = item
+    if positions is not None:
+      positions[item] = index
 
-  def insert_at_next_index(self, item):
-    self.item_count += 1
-    if len(self.invalid_index_set) == 0:
-      # Return index for a new item in the list.
-      index = len(self.items)
-      self.items.append(item)
-      return index
-    index = self.invalid_index_set.pop()
-    self.items[index] = item
-    return index
+  def sift_down(self, index):
+    """Move the item at index down until its children are in heap order.
+
+    Runtime:
+      O(d*log_d(N)) time where N is the number of items in the heap and d is
+      the arity.
+    """
+    items = self.items
+    positions = self.positions
+    arity = self.arity
+    item = items[index]
+    count = self.item_count
+    while True:
+      child_index = arity * (index - 1) + 2 # Same as first_child_index().
+      if child_index > count:
+        break
+      child = items[child_index]
+      end = min(child_index + arity, count + 1)
+      for sibling_index in xrange(child_index + 1, end):
+        sibling = items[sibling_index]
+        if not self.is_heap_order(child, sibling):
+          # The sibling should be on top.
+          child_index = sibling_index
+          child = sibling
+      if self.is_heap_order(item, child):
+        break
+      # Move the child up into the hole.
+      items[index] = child
+      if positions is not None:
+        positions[child] = index
+      index = child_index
+    items[index] = item
+    if positions is not None:
+      positions[item] = index
 
   def peek(self):
     """Peek at the top item in the heap.
@@ -100,6 +327,9 @@ class Heap(object):
   def pop(self):
     """Remove and return the top item.
 
+    The last item moves into the root and sifts down, so the items stay a
+    complete tree with no holes and the list shrinks as the heap drains.
+
     Returns:
       The top item.
 
@@ -107,66 +337,535 @@ class Heap(object):
       O(log(N)) time where N is the number of items in the heap.
     """
     result = self.peek()
+    self.remove_index(1)
+    return result
+
+  def remove_index(self, index):
+    """Remove the item at index and restore heap order."""
+    item = self.items[index]
+    last = self.items.pop()
     self.item_count -= 1
-    index = 1
-    mem_size = len(self.items)
-    while True:
-      left = index * 2
-      right = left + 1
-      if self.is_invalid_index(left) and self.is_invalid_index(right):
-        # Neither child exists, so delete this item.
-        self.mark_invalid_index(index)
-        return result
-      elif self.is_invalid_index(right):
-        # Right child does not exist, so bubble up from left.
-        self.items[index] = self.items[left]
-        index = left
-      elif self.is_invalid_index(left):
-        # Left child does not exist, so bubble up from right.
-        self.items[index] = self.items[right]
-        index = right
-      elif self.is_heap_order(self.items[left], self.items[right]):
-        # Left child should be on top, so bubble up from left.
-        self.items[index] = self.items[left]
-        index = left
+    if index <= self.item_count:
+      self.items[index] = last
+      if self.positions is not None:
+        self.positions[last] = index
+      self.sift_up(index)
+      if self.positions is not None:
+        index = self.positions[last]
+      self.sift_down(index)
+    if self.positions is not None:
+      del self.positions[item]
+      del self.priorities[item]
+
+  def contains(self, item):
+    """Return True if the addressable heap contains item.
+
+    Runtime:
+      Constant time O(1).
+    """
+    self.check_addressable()
+    return item in self.positions
+
+  def priority(self, item):
+    """Return the priority of an item in the addressable heap.
+
+    Runtime:
+      Constant time O(1).
+    """
+    self.check_addressable()
+    if item not in self.priorities:
+      raise ValueError('Item is not in the heap: %r' % (item,))
+    return self.priorities[item]
+
+  def update(self, item, priority):
+    """Change the priority of an item in the addressable heap.
+
+    Supports both decrease-key and increase-key.
+
+    Args:
+      item: An item in the heap.
+      priority: The new priority of the item.
+
+    Returns:
+      None
+
+    Runtime:
+      O(log(N)) time where N is the number of items in the heap.
+    """
+    self.check_addressable()
+    if item not in self.positions:
+      raise ValueError('Item is not in the heap: %r' % (item,))
+    self.priorities[item] = priority
+    self.sift_up(self.positions[item])
+    self.sift_down(self.positions[item])
+
+  def remove(self, item):
+    """Remove an item from the addressable heap.
+
+    Runtime:
+      O(log(N)) time where N is the number of items in the heap.
+    """
+    self.check_addressable()
+    if item not in self.positions:
+      raise ValueError('Item is not in the heap: %r' % (item,))
+    self.remove_index(self.positions[item])
+
+  def check_addressable(self):
+    if self.positions is None:
+      raise ValueError('Use Heap(addressable=True) to address items')
+
+
+def nlargest(k, items, key=None):
+  """Return the k largest items, largest first.
+
+  Streams items through a bounded min heap, so memory is O(k) no matter how
+  many items there are.
+
+  Args:
+    k: The number of items to return.
+    items: Iterable of values that can be compared to each other.
+    key: Compare key(item) instead of the items. None to compare items.
+
+  Returns:
+    A list of at most k items.
+
+  Runtime:
+    O(N*log(k)) time for N items.
+  """
+  heap = Heap(key=key, capacity=max(k, 0))
+  for item in items:
+    heap.insert(item)
+  result = [heap.pop() for _ in xrange(heap.count())]
+  result.reverse()
+  return result
+
+
+def nsmallest(k, items, key=None):
+  """Return the k smallest items, smallest first.
+
+  Streams items through a bounded max heap, so memory is O(k) no matter how
+  many items there are.
+
+  Args:
+    k: The number of items to return.
+    items: Iterable of values that can be compared to each other.
+    key: Compare key(item) instead of the items. None to compare items.
+
+  Returns:
+    A list of at most k items.
+
+  Runtime:
+    O(N*log(k)) time for N items.
+  """
+  heap = Heap(max_heap=True, key=key, capacity=max(k, 0))
+  for item in items:
+    heap.insert(item)
+  result = [heap.pop() for _ in xrange(heap.count())]
+  result.reverse()
+  return result
+
+
+def merge(*iterables, **kwargs):
+  """Merge sorted iterables into a single sorted stream.
+
+  Holds the head item of each input in a Heap, so memory is O(k) for k
+  inputs. Items that compare equal are generated in the order of their
+  inputs, so the merge is stable. While one input keeps supplying the
+  smallest item, its items skip the heap with a single comparison.
+
+  Args:
+    iterables: Iterables of values, each in ascending order.
+    key: Keyword only. Compare key(item) instead of the items.
+    batch_size: Keyword only. If set, read up to batch_size items at a time
+        from each input instead of calling next() for every item. Memory is
+        O(k*batch_size).
+
+  Yields:
+    The items of all iterables in ascending order.
+
+  Runtime:
+    O(N*log(k)) time for N items in total.
+  """
+  key = kwargs.pop('key', None)
+  batch_size = kwargs.pop('batch_size', None)
+  if kwargs:
+    raise TypeError('Unexpected keyword arguments: %s' % ', '.join(kwargs))
+  if batch_size is not None and batch_size < 1:
+    raise ValueError('Batch size must be at least 1, not %d' % batch_size)
+  if batch_size is None:
+    return merge_heads(iterables, key)
+  return merge_batches(iterables, key, batch_size)
+
+
+class MergeEntry(object):
+  """Heap entry for merge(), ordered by key and then by input index.
+
+  Only the < operator of the keys is used, like sorted(), and the item itself
+  is never compared. Input indexes are unique, so equal keys are ordered by
+  input and the merge is stable.
+  """
+
+  __slots__ = ('key', 'index', 'item')
+
+  def __init__(self, key, index, item):
+    self.key = key
+    self.index = index
+    self.item = item
+
+  def __lt__(self, other):
+    return self.key < other.key or (not other.key < self.key and
+                                    self.index < other.index)
+
+  def __le__(self, other):
+    return not other < self
+
+
+def merge_heads(iterables, key):
+  """Merge by reading one item at a time from each input."""
+  # The entry for the next item is kept outside the heap, so pushpop() can
+  # skip the heap while one input keeps winning.
+  heap = Heap()
+  iterators = [iter(iterable) for iterable in iterables]
+  end = object()
+  for i, iterator in enumerate(iterators):
+    item = next(iterator, end)
+    if item is not end:
+      heap.insert(MergeEntry(item if key is None else key(item), i, item))
+  if heap.count() == 0:
+    return
+  entry = heap.pop()
+  while True:
+    i = entry.index
+    yield entry.item
+    item = next(iterators[i], end)
+    if item is not end:
+      entry = heap.pushpop(MergeEntry(item if key is None else key(item), i,
+                                      item))
+    elif heap.count() > 0:
+      entry = heap.pop()
+    else:
+      return
+
+
+def merge_batches(iterables, key, batch_size):
+  """Merge by reading batch_size items at a time from each input."""
+  heap = Heap()
+  iterators = [iter(iterable) for iterable in iterables]
+  buffers = []
+  for i, iterator in enumerate(iterators):
+    buffer = list(itertools.islice(iterator, batch_size))
+    buffers.append(buffer)
+    if len(buffer) > 0:
+      item = buffer[0]
+      heap.insert(MergeEntry(item if key is None else key(item), i, item))
+  positions = [1] * len(iterators)
+  if heap.count() == 0:
+    return
+  entry = heap.pop()
+  while True:
+    i = entry.index
+    yield entry.item
+    buffer = buffers[i]
+    position = positions[i]
+    if position == len(buffer):
+      buffer = list(itertools.islice(iterators[i], batch_size))
+      buffers[i] = buffer
+      position = 0
+    if position < len(buffer):
+      item = buffer[position]
+      positions[i] = position + 1
+      entry = heap.pushpop(MergeEntry(item if key is None else key(item), i,
+                                      item))
+    elif heap.count() > 0:
+      entry = heap.pop()
+    else:
+      return
+
+
+class PairingHeapNode(object):
+  """A pairing heap node holds an item, its first child and its next sibling.
+
+  Attributes:
+    item: The value stored in the node.
+    child: The first PairingHeapNode in the list of children.
+    sibling: The next PairingHeapNode in the parent's list of children.
+  """
+
+  __slots__ = ('item', 'child', 'sibling')
+
+  def __init__(self, item):
+    self.item = item
+    self.child = None
+    self.sibling = None
+
+
+class PairingHeap(object):
+  """Mergeable min/max heap implemented as a pairing heap.
+
+  Supports the same insert(), peek(), pop() and count() operations as Heap,
+  plus meld(), which moves every item of another PairingHeap into this one
+  in constant time.
+
+  Min heap by default. Use PairingHeap(max_heap=True) to create a max heap.
+  Use PairingHeap(key=func) to compare func(item) instead of the items.
+  """
+
+  def __init__(self, max_heap=False, key=None):
+    self.root = None
+    self.item_count = 0
+    self.is_max_heap = max_heap
+    self.key = key
+
+  def __str__(self):
+    return 'Count: %d, Top: %s' % (self.count(),
+        None if self.root is None else str(self.root.item))
+
+  def count(self):
+    return self.item_count
+
+  def is_heap_order(self, parent, child):
+    if self.key is not None:
+      parent = self.key(parent)
+      child = self.key(child)
+    if self.is_max_heap:
+      # Max heap.
+      return parent >= child
+    else:
+      # Min heap.
+      return parent <= child
+
+  def link(self, first, second):
+    """Make one node the first child of the other, and return the new root."""
+    if self.is_heap_order(first.item, second.item):
+      second.sibling = first.child
+      first.child = second
+      return first
+    first.sibling = second.child
+    second.child = first
+    return second
+
+  def insert(self, item):
+    """Insert an item into the heap.
+
+    Runtime:
+      Constant time O(1).
+    """
+    node = PairingHeapNode(item)
+    if self.root is None:
+      self.root = node
+    else:
+      self.root = self.link(self.root, node)
+    self.item_count += 1
+
+  def peek(self):
+    """Peek at the top item in the heap.
+
+    Runtime:
+      Constant time O(1).
+    """
+    if self.count() <= 0:
+      raise ValueError('Cannot peek at value that does not exist')
+    return self.root.item
+
+  def pop(self):
+    """Remove and return the top item.
+
+    The children of the root are linked in pairs from left to right, and
+    then the pairs are linked together from right to left.
+
+    Runtime:
+      O(log(N)) amortized time where N is the number of items in the heap.
+    """
+    result = self.peek()
+    pairs = []
+    node = self.root.child
+    while node is not None:
+      second = node.sibling
+      if second is None:
+        pairs.append(node)
+        break
+      next_node = second.sibling
+      node.sibling = None
+      second.sibling = None
+      pairs.append(self.link(node, second))
+      node = next_node
+    root = None
+    if len(pairs) > 0:
+      root = pairs.pop()
+      while len(pairs) > 0:
+        root = self.link(pairs.pop(), root)
+    self.root = root
+    self.item_count -= 1
+    return result
+
+  def meld(self, other):
+    """Move every item from other into this heap. Other becomes empty.
+
+    Args:
+      other: A PairingHeap with the same ordering as this heap.
+
+    Returns:
+      None
+
+    Runtime:
+      Constant time O(1).
+    """
+    if other is self:
+      return
+    if other.is_max_heap != self.is_max_heap or other.key != self.key:
+      raise ValueError('Cannot meld heaps with different ordering')
+    if other.root is not None:
+      if self.root is None:
+        self.root = other.root
       else:
-        # Right child should be on top, so bubble up from right.
-        self.items[index] = self.items[right]
-        index = right
+        self.root = self.link(self.root, other.root)
+    self.item_count += other.item_count
+    other.root = None
+    other.item_count = 0
 
-  def is_invalid_index(self, index):
-    if index <= 0:
-      return True
-    if index >= len(self.items):
-      return True
-    return index in self.invalid_index_set
 
-  def mark_invalid_index(self, index):
-    self.invalid_index_set.add(index)
+class ConcurrentHeap(object):
+  """Thread-safe wrapper around a Heap.
 
+  Every operation holds a single lock. pop() can block until another
+  thread inserts an item, so consumers do not need to poll count().
+  push_many() and pop_many() move a batch of items per lock acquisition.
 
-class TestHeap(unittest.TestCase):
-  """Test cases for the min-heap."""
+  The constructor arguments are passed to the Heap constructor.
+  """
+
+  def __init__(self, max_heap=False, key=None, arity=2):
+    self.heap = Heap(max_heap=max_heap, key=key, arity=arity)
+    self.condition = threading.Condition(threading.Lock())
+
+  def __str__(self):
+    with self.condition:
+      return str(self.heap)
+
+  def count(self):
+    with self.condition:
+      return self.heap.count()
+
+  def insert(self, item):
+    """Insert an item and wake up one waiting consumer.
+
+    Runtime:
+      O(log(N)) time where N is the number of items in the heap.
+    """
+    with self.condition:
+      self.heap.insert(item)
+      self.condition.notify()
+
+  def push_many(self, items):
+    """Insert a batch of items with a single lock acquisition.
+
+    Runtime:
+      Same as Heap.push_many().
+    """
+    items = list(items)
+    with self.condition:
+      self.heap.push_many(items)
+      self.condition.notify(len(items))
+
+  def peek(self):
+    """Peek at the top item in the heap.
+
+    Raises:
+      ValueError: If the heap is empty.
+    """
+    with self.condition:
+      return self.heap.peek()
+
+  def pop(self, block=True, timeout=None):
+    """Remove and return the top item.
+
+    Args:
+      block: If True, wait for an item when the heap is empty.
+      timeout: Only used if block is True. The maximum number of seconds to
+          wait. None to wait forever.
+
+    Returns:
+      The top item.
+
+    Raises:
+      ValueError: If the heap is still empty after waiting.
+
+    Runtime:
+      O(log(N)) time where N is the number of items in the heap.
+    """
+    with self.condition:
+      self.wait_for_items(block, timeout)
+      return self.heap.pop()
+
+  def pop_many(self, n, block=True, timeout=None):
+    """Remove and return up to n items with a single lock acquisition.
+
+    Waits like pop() until at least one item is available, then returns
+    without waiting for more.
+
+    Args:
+      n: The maximum number of items to return.
+      block: If True, wait for an item when the heap is empty.
+      timeout: Only used if block is True. The maximum number of seconds to
+          wait. None to wait forever.
+
+    Returns:
+      A list of between 1 and n items in heap order.
+
+    Raises:
+      ValueError: If the heap is still empty after waiting.
+
+    Runtime:
+      O(K*log(N)) time for K items.
+    """
+    with self.condition:
+      self.wait_for_items(block, timeout)
+      heap = self.heap
+      return [heap.pop() for _ in xrange(min(n, heap.count()))]
+
+  def wait_for_items(self, block, timeout):
+    """Wait until the heap has an item. The lock must be held."""
+    if not block:
+      timeout = 0
+    if timeout is not None:
+      deadline = time.time() + timeout
+    while self.heap.count() == 0:
+      if timeout is None:
+        self.condition.wait()
+      else:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+          raise ValueError('Cannot pop value that does not exist')
+        self.condition.wait(remaining)
+
+
+class HeapTestCases(object):
+  """Test cases shared by every heap implementation.
+
+  Subclasses set heap_class to the class under test.
+  """
+
+  heap_class = None
 
   def test_empty(self):
-    heap = Heap()
+    heap = self.heap_class()
     self.assertIsNotNone(heap)
 
   def test_insert_one(self):
-    heap = Heap()
+    heap = self.heap_class()
     heap.insert(1)
     result = heap.peek()
     self.assertEqual(result, 1)
 
   def test_insert_two(self):
-    heap = Heap()
+    heap = self.heap_class()
     heap.insert(2)
     heap.insert(1)
     result = heap.peek()
     self.assertEqual(result, 1)
 
   def test_pop(self):
-    heap = Heap()
+    heap = self.heap_class()
     heap.insert(5)
     heap.insert(1)
     heap.insert(2)
@@ -184,7 +883,7 @@ class TestHeap(unittest.TestCase):
     self.assertEqual(result, 5)
 
   def test_pop_and_insert(self):
-    heap = Heap()
+    heap = self.heap_class()
     heap.insert(7)
     heap.insert(6)
     result = heap.pop()
@@ -194,7 +893,7 @@ class TestHeap(unittest.TestCase):
     self.assertEqual(result, 7)
 
   def test_max_heap(self):
-    heap = Heap(max_heap=True)
+    heap = self.heap_class(max_heap=True)
     heap.insert(7)
     heap.insert(6)
     result = heap.pop()
@@ -203,6 +902,378 @@ class TestHeap(unittest.TestCase):
     result = heap.pop()
     self.assertEqual(result, 8)
 
+  def test_key(self):
+    heap = self.heap_class(key=lambda item: item[1])
+    heap.insert(('a', 3))
+    heap.insert(('b', 1))
+    heap.insert(('c', 2))
+    self.assertEqual(heap.pop(), ('b', 1))
+    self.assertEqual(heap.pop(), ('c', 2))
+    self.assertEqual(heap.pop(), ('a', 3))
+
+  def test_pop_empty(self):
+    heap = self.heap_class()
+    self.assertRaises(ValueError, heap.pop)
+
+  def test_random_churn(self):
+    rng = random.Random(1)
+    for max_heap in (False, True):
+      heap = self.heap_class(max_heap=max_heap)
+      expected = []
+      for _ in xrange(2000):
+        if rng.random() < 0.55 or len(expected) == 0:
+          item = rng.randint(0, 100)
+          heap.insert(item)
+          expected.append(item)
+        else:
+          if max_heap:
+            top = max(expected)
+          else:
+            top = min(expected)
+          self.assertEqual(heap.pop(), top)
+          expected.remove(top)
+        self.assertEqual(heap.count(), len(expected))
+
+
+class TestHeap(HeapTestCases, unittest.TestCase):
+  """Test cases for the min-heap."""
+
+  heap_class = Heap
+
+  def test_from_iterable(self):
+    rng = random.Random(2)
+    for size in xrange(0, 40):
+      data = [rng.randint(0, 20) for _ in xrange(size)]
+      for max_heap in (False, True):
+        heap = Heap.from_iterable(iter(data), max_heap=max_heap)
+        self.assertEqual(heap.count(), size)
+        result = [heap.pop() for _ in xrange(size)]
+        self.assertEqual(result, sorted(data, reverse=max_heap))
+
+  def test_push_many(self):
+    rng = random.Random(3)
+    heap = Heap()
+    expected = []
+    for size in (0, 5, 1, 20, 3, 100):
+      batch = [rng.randint(0, 50) for _ in xrange(size)]
+      heap.push_many(iter(batch))
+      expected.extend(batch)
+      self.assertEqual(heap.count(), len(expected))
+    result = [heap.pop() for _ in xrange(len(expected))]
+    self.assertEqual(result, sorted(expected))
+
+  def test_key_from_iterable(self):
+    data = ['ccc', 'a', 'dddd', 'bb']
+    heap = Heap.from_iterable(data, max_heap=True, key=len)
+    self.assertEqual([heap.pop() for _ in data], ['dddd', 'ccc', 'bb', 'a'])
+
+  def test_addressable(self):
+    heap = Heap(addressable=True)
+    heap.insert('a', 5)
+    heap.insert('b', 3)
+    heap.insert('c', 4)
+    self.assertTrue(heap.contains('a'))
+    self.assertFalse(heap.contains('d'))
+    self.assertEqual(heap.peek(), 'b')
+    heap.update('a', 1)
+    self.assertEqual(heap.priority('a'), 1)
+    self.assertEqual(heap.peek(), 'a')
+    heap.update('a', 10)
+    self.assertEqual(heap.peek(), 'b')
+    heap.remove('b')
+    self.assertFalse(heap.contains('b'))
+    self.assertEqual(heap.pop(), 'c')
+    self.assertEqual(heap.pop(), 'a')
+    self.assertEqual(heap.count(), 0)
+    self.assertEqual(heap.positions, {})
+    self.assertEqual(heap.priorities, {})
+
+  def test_addressable_errors(self):
+    heap = Heap(addressable=True)
+    heap.insert(1)
+    self.assertRaises(ValueError, heap.insert, 1)
+    self.assertRaises(ValueError, heap.update, 2, 0)
+    self.assertRaises(ValueError, heap.remove, 2)
+    self.assertRaises(ValueError, Heap().insert, 1, 1)
+    self.assertRaises(ValueError, Heap().contains, 1)
+
+  def test_addressable_random(self):
+    rng = random.Random(4)
+    heap = Heap.from_iterable(xrange(50), key=lambda item: -item,
+                              addressable=True)
+    expected = dict((item, -item) for item in xrange(50))
+    for _ in xrange(2000):
+      op = rng.random()
+      item = rng.randint(0, 100)
+      if op < 0.3:
+        if item in expected:
+          self.assertRaises(ValueError, heap.insert, item, 0)
+        else:
+          heap.insert(item, item % 7)
+          expected[item] = item % 7
+      elif op < 0.6:
+        if item in expected:
+          heap.update(item, rng.randint(-100, 100))
+          expected[item] = heap.priority(item)
+      elif op < 0.8:
+        if item in expected:
+          heap.remove(item)
+          del expected[item]
+      elif len(expected) > 0:
+        top = heap.peek()
+        self.assertEqual(heap.priority(top), min(expected.values()))
+        self.assertEqual(heap.pop(), top)
+        del expected[top]
+      self.assertEqual(heap.count(), len(expected))
+      for item in expected:
+        self.assertEqual(heap.items[heap.positions[item]], item)
+
+  def test_arity(self):
+    rng = random.Random(5)
+    for arity in (2, 3, 4, 8):
+      for max_heap in (False, True):
+        data = [rng.randint(0, 100) for _ in xrange(200)]
+        heap = Heap(max_heap=max_heap, arity=arity)
+        for item in data[:100]:
+          heap.insert(item)
+        heap.push_many(data[100:])
+        result = [heap.pop() for _ in data]
+        self.assertEqual(result, sorted(data, reverse=max_heap))
+        heap = Heap.from_iterable(data, max_heap=max_heap, arity=arity)
+        result = [heap.pop() for _ in data]
+        self.assertEqual(result, sorted(data, reverse=max_heap))
+
+  def test_arity_index_math(self):
+    heap = Heap(arity=4)
+    self.assertEqual(heap.first_child_index(1), 2)
+    self.assertEqual(heap.first_child_index(2), 6)
+    for index in xrange(2, 6):
+      self.assertEqual(heap.parent_index(index), 1)
+    for index in xrange(6, 10):
+      self.assertEqual(heap.parent_index(index), 2)
+    self.assertRaises(ValueError, Heap, arity=1)
+
+  def test_capacity(self):
+    heap = Heap(capacity=3)
+    for item in [5, 1, 9, 3, 7, 2]:
+      heap.insert(item)
+    self.assertEqual(heap.count(), 3)
+    self.assertEqual([heap.pop() for _ in xrange(3)], [5, 7, 9])
+    heap = Heap.from_iterable([5, 1, 9, 3, 7, 2], max_heap=True, capacity=2)
+    self.assertEqual([heap.pop() for _ in xrange(2)], [2, 1])
+    heap = Heap(capacity=0)
+    heap.insert(1)
+    self.assertEqual(heap.count(), 0)
+    self.assertRaises(ValueError, Heap, capacity=-1)
+
+  def test_pushpop_and_replace(self):
+    heap = Heap.from_iterable([3, 5, 7])
+    self.assertEqual(heap.pushpop(1), 1)
+    self.assertEqual(heap.pushpop(4), 3)
+    self.assertEqual(heap.replace(1), 4)
+    self.assertEqual([heap.pop() for _ in xrange(3)], [1, 5, 7])
+    self.assertEqual(Heap().pushpop(1), 1)
+    self.assertRaises(ValueError, Heap().replace, 1)
+
+  def test_addressable_capacity(self):
+    heap = Heap(addressable=True, capacity=2)
+    heap.insert('a', 3)
+    heap.insert('b', 1)
+    heap.insert('c', 2)
+    self.assertFalse(heap.contains('b'))
+    self.assertEqual(heap.replace('d'), 'c')
+    self.assertEqual([heap.pop() for _ in xrange(2)], ['a', 'd'])
+
+  def test_nlargest_and_nsmallest(self):
+    rng = random.Random(6)
+    data = [rng.randint(0, 1000) for _ in xrange(500)]
+    for k in (0, 1, 10, 500, 600):
+      self.assertEqual(nlargest(k, iter(data)), sorted(data, reverse=True)[:k])
+      self.assertEqual(nsmallest(k, iter(data)), sorted(data)[:k])
+    words = ['ccc', 'a', 'dddd', 'bb']
+    self.assertEqual(nlargest(2, words, key=len), ['dddd', 'ccc'])
+    self.assertEqual(nsmallest(2, words, key=len), ['a', 'bb'])
+
+  def test_items_shrink(self):
+    heap = Heap()
+    for i in xrange(100):
+      heap.insert(i)
+    for i in xrange(90):
+      heap.pop()
+    self.assertEqual(heap.count(), 10)
+    self.assertEqual(len(heap.items), 11)
+
+
+class TestMerge(unittest.TestCase):
+  """Test cases for merging sorted iterables."""
+
+  def test_merge(self):
+    rng = random.Random(8)
+    for batch_size in (None, 1, 3, 100):
+      inputs = [sorted(rng.randint(0, 100) for _ in xrange(rng.randint(0, 50)))
+                for _ in xrange(10)]
+      expected = sorted(itertools.chain(*inputs))
+      result = list(merge(*[iter(x) for x in inputs], batch_size=batch_size))
+      self.assertEqual(result, expected)
+
+  def test_merge_empty(self):
+    self.assertEqual(list(merge()), [])
+    self.assertEqual(list(merge([], [])), [])
+    self.assertEqual(list(merge([], [1], batch_size=2)), [1])
+
+  def test_merge_is_stable(self):
+    inputs = [[(1, 'a'), (2, 'a')], [(1, 'b'), (2, 'b')], [(1, 'c')]]
+    expected = [(1, 'a'), (1, 'b'), (1, 'c'), (2, 'a'), (2, 'b')]
+    key = lambda item: item[0]
+    self.assertEqual(list(merge(*inputs, key=key)), expected)
+    self.assertEqual(list(merge(*inputs, key=key, batch_size=2)), expected)
+
+  def test_merge_only_uses_less_than(self):
+    rng = random.Random(3)
+    for batch_size in (None, 2):
+      inputs = [sorted(LessThanItem(rng.randint(0, 20), (i, j))
+                       for j in xrange(50))
+                for i in xrange(4)]
+      result = list(merge(*inputs, batch_size=batch_size))
+      # Sorting the tags orders them by input, then by position in the input.
+      expected = sorted(itertools.chain(*inputs),
+                        key=lambda item: (item.key, item.tag))
+      self.assertEqual([item.tag for item in result],
+                       [item.tag for item in expected])
+
+  def test_merge_key(self):
+    inputs = [['a', 'ccc'], ['bb', 'dddd']]
+    self.assertEqual(list(merge(*inputs, key=len)), ['a', 'bb', 'ccc', 'dddd'])
+
+  def test_merge_is_lazy(self):
+    result = merge(itertools.count(0, 2), itertools.count(1, 2))
+    self.assertEqual(list(itertools.islice(result, 5)), [0, 1, 2, 3, 4])
+    result = merge(itertools.count(0, 2), itertools.count(1, 2), batch_size=4)
+    self.assertEqual(list(itertools.islice(result, 5)), [0, 1, 2, 3, 4])
+
+  def test_merge_bad_arguments(self):
+    self.assertRaises(TypeError, merge, [], size=1)
+    self.assertRaises(ValueError, merge, [], batch_size=0)
+
+
+class LessThanItem(object):
+  """Test item that only defines <, with a tag that is never compared."""
+
+  def __init__(self, key, tag):
+    self.key = key
+    self.tag = tag
+
+  def __lt__(self, other):
+    return self.key < other.key
+
+
+class TestPairingHeap(HeapTestCases, unittest.TestCase):
+  """Test cases for the pairing heap."""
+
+  heap_class = PairingHeap
+
+  def test_meld(self):
+    first = PairingHeap()
+    second = PairingHeap()
+    for item in [5, 1, 9]:
+      first.insert(item)
+    for item in [4, 0, 7, 2]:
+      second.insert(item)
+    first.meld(second)
+    self.assertEqual(first.count(), 7)
+    self.assertEqual(second.count(), 0)
+    self.assertRaises(ValueError, second.peek)
+    self.assertEqual([first.pop() for _ in xrange(7)], [0, 1, 2, 4, 5, 7, 9])
+
+  def test_meld_empty(self):
+    heap = PairingHeap()
+    heap.meld(PairingHeap())
+    self.assertEqual(heap.count(), 0)
+    other = PairingHeap()
+    other.insert(1)
+    heap.meld(other)
+    self.assertEqual(heap.pop(), 1)
+    heap.meld(heap)
+    self.assertEqual(heap.count(), 0)
+
+  def test_meld_different_ordering(self):
+    self.assertRaises(ValueError, PairingHeap().meld,
+                      PairingHeap(max_heap=True))
+
+  def test_meld_random(self):
+    rng = random.Random(7)
+    shards = [PairingHeap(max_heap=True) for _ in xrange(8)]
+    expected = []
+    for _ in xrange(1000):
+      item = rng.randint(0, 100)
+      rng.choice(shards).insert(item)
+      expected.append(item)
+    merged = shards[0]
+    for shard in shards[1:]:
+      merged.meld(shard)
+    result = [merged.pop() for _ in xrange(merged.count())]
+    self.assertEqual(result, sorted(expected, reverse=True))
+
+
+class TestConcurrentHeap(unittest.TestCase):
+  """Test cases for the thread-safe heap."""
+
+  def test_insert_and_pop(self):
+    heap = ConcurrentHeap()
+    heap.insert(2)
+    heap.insert(1)
+    self.assertEqual(heap.count(), 2)
+    self.assertEqual(heap.peek(), 1)
+    self.assertEqual(heap.pop(), 1)
+    self.assertEqual(heap.pop(), 2)
+
+  def test_pop_many(self):
+    heap = ConcurrentHeap(max_heap=True)
+    heap.push_many([3, 1, 4, 1, 5])
+    self.assertEqual(heap.pop_many(3), [5, 4, 3])
+    self.assertEqual(heap.pop_many(3), [1, 1])
+
+  def test_pop_empty(self):
+    heap = ConcurrentHeap()
+    self.assertRaises(ValueError, heap.pop, block=False)
+    self.assertRaises(ValueError, heap.pop, timeout=0.01)
+    self.assertRaises(ValueError, heap.pop_many, 2, timeout=0.01)
+
+  def test_blocking_pop(self):
+    heap = ConcurrentHeap()
+    results = []
+    consumers = [threading.Thread(target=lambda: results.append(heap.pop()))
+                 for _ in xrange(4)]
+    for consumer in consumers:
+      consumer.start()
+    heap.push_many([1, 2])
+    heap.insert(3)
+    heap.insert(4)
+    for consumer in consumers:
+      consumer.join(5)
+      self.assertFalse(consumer.is_alive())
+    self.assertEqual(sorted(results), [1, 2, 3, 4])
+
+  def test_threads(self):
+    heap = ConcurrentHeap()
+    results = []
+    def produce(start):
+      for item in xrange(start, start + 1000):
+        heap.insert(item)
+    def consume():
+      for _ in xrange(10):
+        results.extend(heap.pop_many(100))
+    threads = [threading.Thread(target=produce, args=(i * 1000,))
+               for i in xrange(4)]
+    threads.extend(threading.Thread(target=consume) for _ in xrange(4))
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    while heap.count() > 0:
+      results.append(heap.pop())
+    self.assertEqual(sorted(results), range(4000))
+
 
 if __name__ == '__main__':
   unittest.main()
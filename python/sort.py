@@ -12,18 +12,37 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import array
+import bisect
+import itertools
+import marshal
+import multiprocessing
+from multiprocessing import sharedctypes
+import operator
+import os
 import random
 import sys
+import tempfile
 import unittest
 
 from heap import Heap
+from heap import merge
+
+try:
+  import numpy
+except ImportError:
+  numpy = None # The vectorized sorts fall back to pure Python.
 
 class Sorter(object):
 
+  vectorized = False # Sorters that support NumPy set this per instance.
+
   def sort(self, data):
     raise NotImplementedError()
 
   def is_sorted(self, data):
+    if numpy is not None and isinstance(data, numpy.ndarray):
+      return bool(numpy.all(data[:-1] <= data[1:]))
     l = len(data)
     if l == 0:
       return True
@@ -35,6 +54,76 @@ class Sorter(object):
       val = next_val
     return True
 
+  def argsort(self, keys):
+    """Return the indexes that would sort keys, keeping equal keys in order.
+
+    Vectorized sorters use numpy.argsort when NumPy is installed and the keys
+    are numeric. Otherwise the sorter sorts (key, index) pairs.
+    """
+    if self.vectorized:
+      values = as_numeric_array(keys)
+      if values is not None:
+        return numpy.argsort(values, kind='mergesort').tolist()
+    pairs = self.sort([(k, i) for i, k in enumerate(keys)])
+    return [i for _, i in pairs]
+
+  def sort_by_key(self, data_input, key):
+    """Return a sorted copy of data_input, ordered by key(item)."""
+    data = list(data_input) # Copy list
+    order = self.argsort([key(item) for item in data])
+    return [data[i] for i in order]
+
+
+def as_numeric_array(data):
+  """Return data as a 1-D numeric NumPy array, or None if that is not possible.
+
+  Args:
+    data: A NumPy array, list or tuple.
+
+  Returns None if NumPy is not installed, or if data is not all int or all
+  float items, or if it contains NaN. Longs and bools are not converted, so
+  the array never holds rounded or out of range values.
+  """
+  if numpy is None:
+    return None
+  if isinstance(data, numpy.ndarray):
+    values = data
+  else:
+    if not isinstance(data, (list, tuple)):
+      return None
+    if all(type(item) is int for item in data):
+      values = numpy.array(data, dtype=numpy.int64)
+    elif all(type(item) is float for item in data):
+      values = numpy.array(data, dtype=numpy.float64)
+    else:
+      return None
+  if values.ndim != 1 or values.dtype.kind not in 'iuf':
+    return None
+  if values.dtype.kind == 'f' and numpy.isnan(values).any():
+    return None
+  return values
+
+
+def numeric_input(data_input):
+  """Return (data, values) for a vectorized sort of data_input.
+
+  data is a NumPy array input, or a list copy of any other input. values is
+  as_numeric_array(data). Iterators are only read once.
+  """
+  if numpy is not None and isinstance(data_input, numpy.ndarray):
+    values = as_numeric_array(data_input)
+    if values is not None:
+      return data_input, values
+  data = list(data_input) # Copy list
+  return data, as_numeric_array(data)
+
+
+def vectorized_result(result, data_input):
+  """Return a NumPy array for NumPy input, or a list for any other input."""
+  if isinstance(data_input, numpy.ndarray):
+    return result
+  return result.tolist()
+
 
 class BubbleSorter(Sorter):
 
@@ -56,9 +145,7 @@ class HeapSorter(Sorter):
 
   def sort(self, data_input):
     data = list(data_input) # Copy list
-    heap = Heap()
-    for d in data:
-      heap.insert(d)
+    heap = Heap.from_iterable(data)
     for i in xrange(len(data)):
       data[i] = heap.pop()
     return data
@@ -78,12 +165,156 @@ class InsertionSorter(Sorter):
 
 
 class MergeSorter(Sorter):
+  """Merge sort.
+
+  Top-down by default. Use MergeSorter(bottom_up=True) for an iterative,
+  stable merge sort. It sorts small blocks with insertion sort, then merges
+  runs of doubling width back and forth between the list and one auxiliary
+  buffer, so peak memory is one extra list of N items. When one run wins
+  MIN_GALLOP times in a row, the merge gallops: it finds the end of the
+  winning streak with a binary search and copies it as one slice.
+  """
+
+  BLOCK_SIZE = 32 # Bottom-up merging starts from blocks of this size.
+  MIN_GALLOP = 7 # Consecutive wins before switching to galloping.
+  VECTOR_BLOCK_SIZE = 1024 # Vectorized merging starts from these blocks.
+
+  def __init__(self, bottom_up=False, vectorized=False):
+    self.bottom_up = bottom_up
+    self.vectorized = vectorized
 
   def sort(self, data_input):
-    data = list(data_input) # Copy list
-    self.merge_sort(data, 0, len(data_input) - 1)
+    if self.vectorized:
+      data, values = numeric_input(data_input)
+      if values is not None:
+        return vectorized_result(self.vectorized_sort(values), data_input)
+    else:
+      data = list(data_input) # Copy list
+    if self.bottom_up:
+      return self.bottom_up_sort(data)
+    self.merge_sort(data, 0, len(data) - 1)
     return data
 
+  def bottom_up_sort(self, data):
+    """Sort data with an iterative, stable merge sort.
+
+    Returns:
+      The sorted list, which is either data or the auxiliary buffer.
+    """
+    n = len(data)
+    block_size = self.BLOCK_SIZE
+    for lo in xrange(0, n, block_size):
+      self.insertion_sort(data, lo, min(lo + block_size, n))
+    src = data
+    dst = [None] * n
+    width = block_size
+    while width < n:
+      for lo in xrange(0, n, 2 * width):
+        mid = min(lo + width, n)
+        hi = min(lo + 2 * width, n)
+        self.merge_into(src, dst, lo, mid, hi)
+      src, dst = dst, src
+      width *= 2
+    return src
+
+  def vectorized_sort(self, values):
+    """Stable bottom-up merge sort of a numeric NumPy array.
+
+    Blocks are sorted in one batched call, then each merge is done with
+    vectorized binary searches instead of one comparison at a time.
+
+    Returns:
+      A new sorted array.
+    """
+    n = len(values)
+    block_size = self.VECTOR_BLOCK_SIZE
+    result = values.copy()
+    full = n - n % block_size
+    if full > 0:
+      blocks = result[:full].reshape(-1, block_size)
+      result[:full] = numpy.sort(blocks, axis=1, kind='mergesort').ravel()
+    if full < n:
+      result[full:] = numpy.sort(result[full:], kind='mergesort')
+    buffer = numpy.empty_like(result)
+    width = block_size
+    while width < n:
+      for lo in xrange(0, n, 2 * width):
+        mid = min(lo + width, n)
+        hi = min(lo + 2 * width, n)
+        self.merge_arrays(result[lo:mid], result[mid:hi], buffer[lo:hi])
+      result, buffer = buffer, result
+      width *= 2
+    return result
+
+  def merge_arrays(self, left, right, out):
+    """Stable merge of sorted arrays left and right into out."""
+    if len(right) == 0:
+      out[:] = left
+      return
+    # Each item moves forward by the number of items from the other run that
+    # go before it. Equal items from the left run go first.
+    left_index = numpy.arange(len(left))
+    left_index += numpy.searchsorted(right, left, side='left')
+    right_index = numpy.arange(len(right))
+    right_index += numpy.searchsorted(left, right, side='right')
+    out[left_index] = left
+    out[right_index] = right
+
+  def insertion_sort(self, data, lo, hi):
+    """Stable insertion sort of data[lo:hi] in place."""
+    for i in xrange(lo + 1, hi):
+      val = data[i]
+      j = i
+      while j > lo and val < data[j - 1]:
+        data[j] = data[j - 1]
+        j -= 1
+      data[j] = val
+
+  def merge_into(self, src, dst, lo, mid, hi):
+    """Stable merge of src[lo:mid] and src[mid:hi] into dst[lo:hi]."""
+    if mid >= hi or not src[mid] < src[mid - 1]:
+      # Already in order.
+      dst[lo:hi] = src[lo:hi]
+      return
+    min_gallop = self.MIN_GALLOP
+    i = lo
+    j = mid
+    k = lo
+    left_wins = 0
+    right_wins = 0
+    while i < mid and j < hi:
+      if src[j] < src[i]:
+        dst[k] = src[j]
+        j += 1
+        k += 1
+        left_wins = 0
+        right_wins += 1
+        if right_wins >= min_gallop:
+          # Copy every right item that is still less than the left item.
+          end = bisect.bisect_left(src, src[i], j, hi)
+          dst[k:k + end - j] = src[j:end]
+          k += end - j
+          j = end
+          right_wins = 0
+      else:
+        # Equal items come from the left run first, so the merge is stable.
+        dst[k] = src[i]
+        i += 1
+        k += 1
+        right_wins = 0
+        left_wins += 1
+        if left_wins >= min_gallop:
+          # Copy every left item that is less than or equal to the right item.
+          end = bisect.bisect_right(src, src[j], i, mid)
+          dst[k:k + end - i] = src[i:end]
+          k += end - i
+          i = end
+          left_wins = 0
+    if i < mid:
+      dst[k:hi] = src[i:mid]
+    elif j < hi:
+      dst[k:hi] = src[j:hi]
+
   def merge_sort(self, data, left, right):
     if left < right:
       center = (left + right) / 2
@@ -135,15 +366,80 @@ class SelectionSorter(Sorter):
 
 
 class QuickSorter(Sorter):
+  """Quicksort with a random pivot.
+
+  Use QuickSorter(three_way=True) to partition into items less than, equal
+  to and greater than the pivot. Items equal to the pivot are then done, so
+  data with K distinct values sorts in O(N*log(K)) time.
+
+  Both modes recurse into the smaller partition and loop on the larger one,
+  so the recursion depth is O(log(N)).
+
+  Use QuickSorter(vectorized=True) to sort numeric input with NumPy when it
+  is installed. Each partition step is then a batch of array operations.
+  """
+
+  VECTOR_CUTOFF = 1024 # Vectorized partitions up to this size use numpy.sort.
+
+  def __init__(self, three_way=False, vectorized=False):
+    self.three_way = three_way
+    self.vectorized = vectorized
 
   def sort(self, data_input):
-    data = list(data_input) # Copy list
+    if self.vectorized:
+      data, values = numeric_input(data_input)
+      if values is not None:
+        return vectorized_result(self.vectorized_sort(values), data_input)
+    else:
+      data = list(data_input) # Copy list
     self.quick_sort(data, 0, len(data) - 1)
     return data
 
+  def vectorized_sort(self, values):
+    """Quicksort a numeric NumPy array with three-way vectorized partitions.
+
+    Returns:
+      A new sorted array.
+    """
+    result = values.copy()
+    stack = [(0, len(result))]
+    while len(stack) > 0:
+      lo, hi = stack.pop()
+      if hi - lo <= self.VECTOR_CUTOFF:
+        result[lo:hi] = numpy.sort(result[lo:hi])
+        continue
+      part = result[lo:hi]
+      pivot = part[random.randint(0, hi - lo - 1)]
+      less = part[part < pivot]
+      equal = part[part == pivot]
+      greater = part[part > pivot]
+      less_end = lo + len(less)
+      greater_start = hi - len(greater)
+      result[lo:less_end] = less
+      result[less_end:greater_start] = equal
+      result[greater_start:hi] = greater
+      stack.append((lo, less_end))
+      stack.append((greater_start, hi))
+    return result
+
   def quick_sort(self, data, lo, hi):
-    if lo >= hi:
-      return
+    while lo < hi:
+      if self.three_way:
+        left_end, right = self.partition_three_way(data, lo, hi)
+      else:
+        pivot = self.partition(data, lo, hi)
+        left_end = pivot - 1
+        right = pivot + 1
+      # Recurse into the smaller side and loop on the larger side.
+      if left_end - lo < hi - right:
+        self.quick_sort(data, lo, left_end)
+        lo = right
+      else:
+        self.quick_sort(data, right, hi)
+        hi = left_end
+
+  def partition(self, data, lo, hi):
+    """Partition around a random pivot and return the pivot's final index."""
     pivot = random.randint(lo, hi)
     pivot_val = data[pivot]
     data[pivot] = data[lo]
@@ -156,8 +452,609 @@ class QuickSorter(Sorter):
         data[i] = data[pivot + 1] # pivot+1 goes to new value's location
         data[pivot + 1] = pivot_val # pivot goes to pivot+1
         pivot += 1
-    self.quick_sort(data, lo, pivot - 1)
-    self.quick_sort(data, pivot + 1, hi)
+    return pivot
+
+  def partition_three_way(self, data, lo, hi):
+    """Dutch national flag partition around a random pivot.
+
+    Returns:
+      A tuple (left_end, right). Items in data[lo:left_end+1] are less than
+      the pivot, items in data[right:hi+1] are greater, and the items in
+      between are equal to the pivot.
+    """
+    pivot_val = data[random.randint(lo, hi)]
+    lt = lo # data[lo:lt] < pivot
+    i = lo # data[lt:i] == pivot
+    gt = hi # data[gt+1:hi+1] > pivot
+    while i <= gt:
+      val = data[i]
+      if val < pivot_val:
+        data[i] = data[lt]
+        data[lt] = val
+        lt += 1
+        i += 1
+      elif pivot_val < val:
+        data[i] = data[gt]
+        data[gt] = val
+        gt -= 1
+      else:
+        i += 1
+    return lt - 1, gt + 1
+
+
+class HybridSorter(Sorter):
+  """Adaptive sorter that picks a strategy based on the data.
+
+  Input made of long natural runs, ascending or strictly descending, is
+  sorted by a stable merge of the runs, which is close to O(N) for nearly
+  sorted data.
+  Other input is sorted with introsort: quicksort with median-of-three
+  pivots, insertion sort for small partitions, and a heapsort fallback when
+  the recursion gets deeper than 2*log(N), so the worst case is O(N*log(N)).
+  Introsort is not stable, so HybridSorter is not stable in general.
+  """
+
+  INSERTION_CUTOFF = 16 # Partitions up to this size use insertion sort.
+  MIN_RUN = 32 # Merge natural runs when they are this long on average.
+
+  def sort(self, data_input):
+    data = list(data_input) # Copy list
+    n = len(data)
+    if n < 2:
+      return data
+    runs = self.find_runs(data)
+    if len(runs) * self.MIN_RUN <= n:
+      self.merge_runs(data, runs)
+    else:
+      depth_limit = 2 * n.bit_length()
+      self.intro_sort(data, 0, n - 1, depth_limit)
+    return data
+
+  def find_runs(self, data):
+    """Find the natural runs in data and reverse the descending ones.
+
+    Returns:
+      A list of (start, end) index pairs, inclusive, covering all of data.
+    """
+    runs = []
+    n = len(data)
+    start = 0
+    while start < n:
+      end = start + 1
+      if end < n and data[end] < data[start]:
+        # Strictly descending, so reversing it keeps equal items in order.
+        while end < n and data[end] < data[end - 1]:
+          end += 1
+        data[start:end] = data[start:end][::-1]
+      else:
+        while end < n and not data[end] < data[end - 1]:
+          end += 1
+      runs.append((start, end - 1))
+      start = end
+    return runs
+
+  def merge_runs(self, data, runs):
+    """Stable merge of adjacent runs in rounds until one run is left.
+
+    Each round merges from one list into the other, so only one buffer is
+    allocated.
+
+    Runtime:
+      O(N*log(R)) time for R runs.
+    """
+    merger = MergeSorter()
+    src = data
+    dst = [None] * len(data)
+    while len(runs) > 1:
+      merged = []
+      for i in xrange(0, len(runs) - 1, 2):
+        left, _ = runs[i]
+        right, right_end = runs[i + 1]
+        merger.merge_into(src, dst, left, right, right_end + 1)
+        merged.append((left, right_end))
+      if len(runs) % 2 == 1:
+        start, end = runs[-1]
+        dst[start:end + 1] = src[start:end + 1]
+        merged.append(runs[-1])
+      runs = merged
+      src, dst = dst, src
+    if src is not data:
+      data[:] = src
+
+  def intro_sort(self, data, lo, hi, depth_limit):
+    """Sort data[lo:hi+1] in place.
+
+    Recurses into the smaller partition and loops on the larger one, so the
+    stack depth is O(log(N)).
+    """
+    while hi - lo >= self.INSERTION_CUTOFF:
+      if depth_limit == 0:
+        data[lo:hi + 1] = HeapSorter().sort(data[lo:hi + 1])
+        return
+      depth_limit -= 1
+      split = self.partition(data, lo, hi)
+      if split - lo < hi - split:
+        self.intro_sort(data, lo, split, depth_limit)
+        lo = split + 1
+      else:
+        self.intro_sort(data, split + 1, hi, depth_limit)
+        hi = split
+    self.insertion_sort(data, lo, hi)
+
+  def partition(self, data, lo, hi):
+    """Hoare partition around the median of the first, middle and last items.
+
+    Returns:
+      An index split where lo <= split < hi. Every item in data[lo:split+1]
+      is less than or equal to every item in data[split+1:hi+1].
+    """
+    mid = (lo + hi) / 2
+    if data[mid] < data[lo]:
+      data[lo], data[mid] = data[mid], data[lo]
+    if data[hi] < data[mid]:
+      data[mid], data[hi] = data[hi], data[mid]
+      if data[mid] < data[lo]:
+        data[lo], data[mid] = data[mid], data[lo]
+    pivot = data[mid]
+    i = lo
+    j = hi
+    while True:
+      while data[i] < pivot:
+        i += 1
+      while pivot < data[j]:
+        j -= 1
+      if i >= j:
+        return j
+      data[i], data[j] = data[j], data[i]
+      i += 1
+      j -= 1
+
+  def insertion_sort(self, data, lo, hi):
+    """Sort data[lo:hi+1] in place. Fast for small or nearly sorted ranges."""
+    for i in xrange(lo + 1, hi + 1):
+      val = data[i]
+      j = i
+      while j > lo and val < data[j - 1]:
+        data[j] = data[j - 1]
+        j -= 1
+      data[j] = val
+
+
+class CountingSorter(Sorter):
+  """Stable counting sort for integer keys.
+
+  Counts the items for every key between the smallest and largest key, so
+  it runs in O(N + K) time and memory, where K is the size of the key range.
+  If K is more than MAX_RANGE_FACTOR*N, and more than MIN_MAX_RANGE, the
+  counts would not pay off, so the items are radix sorted instead.
+
+  Use CountingSorter(key=func) to sort items by the integer func(item).
+  """
+
+  MAX_RANGE_FACTOR = 4 # Larger key ranges are radix sorted.
+  MIN_MAX_RANGE = 256 # Key ranges up to this size are always counted.
+
+  def __init__(self, key=None):
+    self.key = key
+
+  def is_sorted(self, data):
+    if self.key is not None:
+      data = [self.key(item) for item in data]
+    return Sorter.is_sorted(self, data)
+
+  def argsort(self, keys):
+    """Return the indexes that would sort keys, keeping equal keys in order."""
+    return type(self)(key=keys.__getitem__).sort(xrange(len(keys)))
+
+  def sort(self, data_input):
+    data = list(data_input) # Copy list
+    n = len(data)
+    if n < 2:
+      return data
+    if self.key is None:
+      keys = data
+    else:
+      keys = [self.key(item) for item in data]
+    check_integer_keys(keys)
+    lo = min(keys)
+    hi = max(keys)
+    if hi - lo > max(self.MAX_RANGE_FACTOR * n, self.MIN_MAX_RANGE):
+      return RadixSorter().sort_integers(data, keys)
+    # counts[k - lo] becomes the next output index for key k.
+    counts = array.array('l', [0]) * (hi - lo + 2)
+    for k in keys:
+      counts[k - lo + 1] += 1
+    for i in xrange(1, len(counts)):
+      counts[i] += counts[i - 1]
+    result = [None] * n
+    for i in xrange(n):
+      offset = keys[i] - lo
+      index = counts[offset]
+      result[index] = data[i]
+      counts[offset] = index + 1
+    return result
+
+
+class RadixSorter(Sorter):
+  """Stable radix sort for integer or byte string keys.
+
+  Integer keys are sorted least significant byte first. Keys are offset by
+  the smallest key, so negative keys work, and the number of passes is the
+  byte width of the largest offset. Runs in O(N*W) time for W bytes.
+
+  Byte string keys are sorted most significant byte first, so keys may have
+  different lengths. A shorter key sorts before every longer key that starts
+  with it. Small buckets are finished with insertion sort.
+
+  Use RadixSorter(key=func) to sort items by func(item).
+  """
+
+  INSERTION_CUTOFF = 32 # Byte string buckets up to this size use insertion.
+
+  def __init__(self, key=None):
+    self.key = key
+
+  def is_sorted(self, data):
+    if self.key is not None:
+      data = [self.key(item) for item in data]
+    return Sorter.is_sorted(self, data)
+
+  def argsort(self, keys):
+    """Return the indexes that would sort keys, keeping equal keys in order."""
+    return type(self)(key=keys.__getitem__).sort(xrange(len(keys)))
+
+  def sort(self, data_input):
+    data = list(data_input) # Copy list
+    if len(data) < 2:
+      return data
+    if self.key is None:
+      keys = list(data)
+    else:
+      keys = [self.key(item) for item in data]
+    if isinstance(keys[0], str):
+      return self.sort_bytes(data, keys)
+    check_integer_keys(keys)
+    return self.sort_integers(data, keys)
+
+  def sort_integers(self, data, keys):
+    """LSD radix sort of data by integer keys, one byte per pass."""
+    n = len(data)
+    lo = min(keys)
+    hi = max(keys)
+    width = ((hi - lo).bit_length() + 7) / 8
+    offsets = [k - lo for k in keys]
+    if width <= 7:
+      offsets = array.array('l', offsets)
+    result = [None] * n
+    result_offsets = offsets[:]
+    for shift in xrange(0, width * 8, 8):
+      digits = [(offset >> shift) & 0xff for offset in offsets]
+      counts = array.array('l', [0]) * 257
+      for digit in digits:
+        counts[digit + 1] += 1
+      for i in xrange(1, 257):
+        counts[i] += counts[i - 1]
+      for i in xrange(n):
+        digit = digits[i]
+        index = counts[digit]
+        result[index] = data[i]
+        result_offsets[index] = offsets[i]
+        counts[digit] = index + 1
+      data, result = result, data
+      offsets, result_offsets = result_offsets, offsets
+    return data
+
+  def sort_bytes(self, data, keys):
+    """MSD radix sort of data by byte string keys."""
+    for k in keys:
+      if not isinstance(k, str):
+        raise ValueError('Radix sort needs all integer or all byte keys')
+    n = len(data)
+    temp_data = [None] * n
+    temp_keys = [None] * n
+    # Each entry is (lo, hi, depth). Keys in data[lo:hi] share their first
+    # depth bytes.
+    stack = [(0, n, 0)]
+    while len(stack) > 0:
+      lo, hi, depth = stack.pop()
+      if hi - lo <= self.INSERTION_CUTOFF:
+        self.insertion_sort(data, keys, lo, hi)
+        continue
+      # Bucket 0 holds keys that end at depth. Byte b goes to bucket b + 1.
+      digits = [ord(k[depth]) + 1 if len(k) > depth else 0
+                for k in keys[lo:hi]]
+      counts = array.array('l', [0]) * 258
+      for digit in digits:
+        counts[digit + 1] += 1
+      for i in xrange(1, 258):
+        counts[i] += counts[i - 1]
+      starts = counts[:]
+      for i in xrange(lo, hi):
+        digit = digits[i - lo]
+        index = counts[digit]
+        temp_data[index] = data[i]
+        temp_keys[index] = keys[i]
+        counts[digit] = index + 1
+      data[lo:hi] = temp_data[:hi - lo]
+      keys[lo:hi] = temp_keys[:hi - lo]
+      # Bucket 0 is done because all of its keys are equal.
+      for digit in xrange(1, 257):
+        start = lo + starts[digit]
+        end = lo + starts[digit + 1]
+        if end - start > 1:
+          stack.append((start, end, depth + 1))
+    return data
+
+  def insertion_sort(self, data, keys, lo, hi):
+    """Stable insertion sort of data[lo:hi] and keys[lo:hi] by key."""
+    for i in xrange(lo + 1, hi):
+      item = data[i]
+      k = keys[i]
+      j = i
+      while j > lo and k < keys[j - 1]:
+        data[j] = data[j - 1]
+        keys[j] = keys[j - 1]
+        j -= 1
+      data[j] = item
+      keys[j] = k
+
+
+def check_integer_keys(keys):
+  """Raise ValueError unless every key is an integer."""
+  for k in keys:
+    if not isinstance(k, (int, long)):
+      raise ValueError('Keys must be integers, not %r' % (k,))
+
+
+class ParallelSorter(Sorter):
+  """Sample sort: split the input into key ranges, sort each in a process.
+
+  Splitters are drawn from a sorted random sample of the keys, and every
+  item is placed in the bucket for its key range. Each worker process sorts
+  one bucket with the chunk sorter, and the sorted buckets are concatenated,
+  so there is no serial merge. Items with equal keys go to the same bucket in
+  input order, so if the chunk sorter is stable, so is the result. Keys are
+  the chunk sorter's key, if it has one, and are compared with < only.
+
+  Integers that fit in a C long, and floats, are handed to the workers in
+  one shared memory array. Each worker sorts its slice of the array in place,
+  so only the bucket bounds are pickled. Other items are pickled to and from
+  the workers a bucket at a time.
+
+  Use ParallelSorter(sorter, processes) to choose the chunk sorter and the
+  number of worker processes. The sorter must be picklable. chunk_size sets
+  the average bucket size, and defaults to one bucket per process.
+  """
+
+  MIN_PARALLEL_SIZE = 50000 # Smaller inputs are sorted in this process.
+  OVERSAMPLING = 64 # Sampled keys per bucket, to balance the buckets.
+
+  def __init__(self, sorter=None, processes=None, chunk_size=None):
+    if sorter is None:
+      sorter = HybridSorter()
+    if processes is None:
+      processes = multiprocessing.cpu_count()
+    if processes < 1:
+      raise ValueError('Processes must be at least 1, not %d' % processes)
+    if chunk_size is not None and chunk_size < 1:
+      raise ValueError('Chunk size must be at least 1, not %d' % chunk_size)
+    self.sorter = sorter
+    self.processes = processes
+    self.chunk_size = chunk_size
+
+  def sort(self, data_input):
+    data = list(data_input) # Copy list
+    n = len(data)
+    if self.processes == 1 or n < self.MIN_PARALLEL_SIZE:
+      return self.sorter.sort(data)
+    if self.chunk_size is None:
+      bucket_count = self.processes
+    else:
+      bucket_count = -(-n // self.chunk_size)
+    buckets = self.partition(data, bucket_count)
+    del data
+    bounds = []
+    lo = 0
+    for bucket in buckets:
+      if len(bucket) > 0:
+        bounds.append((lo, lo + len(bucket)))
+        lo += len(bucket)
+    typecode = shared_typecode(buckets)
+    if typecode is None:
+      pool = multiprocessing.Pool(self.processes)
+      try:
+        chunks = pool.map(sort_chunk, [(self.sorter, bucket)
+                                       for bucket in buckets if bucket])
+      finally:
+        pool.close()
+        pool.join()
+      return list(itertools.chain.from_iterable(chunks))
+    # Workers inherit the shared array when the pool starts.
+    shared = sharedctypes.RawArray(typecode, n)
+    for bucket, (lo, hi) in zip([bucket for bucket in buckets if bucket],
+                                bounds):
+      shared[lo:hi] = bucket
+    del buckets
+    pool = multiprocessing.Pool(self.processes, init_shared_worker,
+                                (shared, self.sorter))
+    try:
+      pool.map(sort_shared_chunk, bounds)
+    finally:
+      pool.close()
+      pool.join()
+    return shared[:]
+
+  def partition(self, data, bucket_count):
+    """Split data into bucket_count lists by key range, in input order."""
+    key = getattr(self.sorter, 'key', None)
+    keys = data if key is None else [key(item) for item in data]
+    sample_size = min(len(keys), bucket_count * self.OVERSAMPLING)
+    sample = sorted(random.Random(len(keys)).sample(keys, sample_size))
+    splitters = [sample[i * sample_size // bucket_count]
+                 for i in xrange(1, bucket_count)]
+    buckets = [[] for _ in xrange(bucket_count)]
+    appends = [bucket.append for bucket in buckets]
+    bisect_right = bisect.bisect_right
+    for item, k in itertools.izip(data, keys):
+      appends[bisect_right(splitters, k)](item)
+    return buckets
+
+
+def shared_typecode(buckets):
+  """Return the shared array typecode that holds every item, or None."""
+  items = itertools.chain.from_iterable(buckets)
+  if all(type(item) is int for item in items):
+    return 'l'
+  items = itertools.chain.from_iterable(buckets)
+  if all(type(item) is float for item in items):
+    return 'd'
+  return None
+
+
+def sort_chunk(args):
+  """Return the chunk sorted with the sorter, from a (sorter, chunk) pair."""
+  sorter, chunk = args
+  return sorter.sort(chunk)
+
+
+SHARED_WORKER = {} # The shared array and sorter in each worker process.
+
+
+def init_shared_worker(shared, sorter):
+  """Store the shared array and chunk sorter for sort_shared_chunk()."""
+  SHARED_WORKER['shared'] = shared
+  SHARED_WORKER['sorter'] = sorter
+
+
+def sort_shared_chunk(bounds):
+  """Sort shared[lo:hi] in place with the worker's chunk sorter."""
+  lo, hi = bounds
+  shared = SHARED_WORKER['shared']
+  shared[lo:hi] = SHARED_WORKER['sorter'].sort(shared[lo:hi])
+
+
+class ExternalSorter(Sorter):
+  """Sort more items than fit in memory by spilling sorted runs to disk.
+
+  Reads the input in runs of run_size items and sorts each run with the
+  in-memory sorter. Each sorted run is written to a temporary file with
+  marshal, in batches of buffer_size items, and the file is closed. The runs
+  are then streamed back through a heap k-way merge, reading one batch at a
+  time from each run. Memory is O(run_size + k*buffer_size) items for k runs.
+
+  At most max_runs runs are merged at once. With more runs, the oldest
+  max_runs runs are merged into one longer run on disk until max_runs are
+  left. A run file is only open while it is written or merged, so at most
+  max_runs + 1 files are open at a time.
+
+  Items must be types that marshal supports, such as numbers, strings and
+  tuples of them. Runs are merged by the sorter's key, if it has one. If the
+  sorter is stable, so is the result.
+
+  Use sort_iter() to stream the sorted items without holding them all in
+  memory. sort() returns a list like the other sorters.
+  """
+
+  def __init__(self, sorter=None, run_size=1000000, buffer_size=1024,
+               max_runs=64):
+    if sorter is None:
+      sorter = HybridSorter()
+    if run_size < 1:
+      raise ValueError('Run size must be at least 1, not %d' % run_size)
+    if buffer_size < 1:
+      raise ValueError('Buffer size must be at least 1, not %d' % buffer_size)
+    if max_runs < 2:
+      raise ValueError('Max runs must be at least 2, not %d' % max_runs)
+    self.sorter = sorter
+    self.run_size = run_size
+    self.buffer_size = buffer_size
+    self.max_runs = max_runs
+
+  def sort(self, data_input):
+    return list(self.sort_iter(data_input))
+
+  def sort_iter(self, data_input):
+    """Generate the items of data_input in ascending order.
+
+    Args:
+      data_input: Any iterable, such as a file object of lines.
+
+    Yields:
+      The items in ascending order.
+    """
+    iterator = iter(data_input)
+    runs = [] # Paths of the run files, oldest first.
+    try:
+      while True:
+        run = list(itertools.islice(iterator, self.run_size))
+        if len(run) == 0:
+          break
+        run = self.sorter.sort(run)
+        if len(runs) == 0 and len(run) < self.run_size:
+          # Everything fit in one run, so nothing is spilled.
+          for item in run:
+            yield item
+          return
+        runs.append(self.write_run(run))
+        del run
+      while len(runs) > self.max_runs:
+        merged = self.merge_to_run(runs[:self.max_runs])
+        runs = runs[self.max_runs:] + [merged]
+      for item in self.merge_runs(runs):
+        yield item
+    finally:
+      for path in runs:
+        remove_run(path)
+
+  def write_run(self, items):
+    """Write the sorted items to a new temporary file and return its path."""
+    fd, path = tempfile.mkstemp(prefix='sort-run-')
+    try:
+      with os.fdopen(fd, 'wb') as run:
+        batch = []
+        for item in items:
+          batch.append(item)
+          if len(batch) == self.buffer_size:
+            marshal.dump(batch, run)
+            batch = []
+        if len(batch) > 0:
+          marshal.dump(batch, run)
+    except:
+      remove_run(path)
+      raise
+    return path
+
+  def read_run(self, path):
+    """Generate the items of a run, reading one batch at a time."""
+    with open(path, 'rb') as run:
+      while True:
+        try:
+          batch = marshal.load(run)
+        except EOFError:
+          return
+        for item in batch:
+          yield item
+
+  def merge_runs(self, runs):
+    """Generate the merged items of runs, by the sorter's key."""
+    key = getattr(self.sorter, 'key', None)
+    return merge(*[self.read_run(path) for path in runs], key=key)
+
+  def merge_to_run(self, runs):
+    """Merge runs into one new run and return its path, then remove them."""
+    try:
+      return self.write_run(self.merge_runs(runs))
+    finally:
+      for path in runs:
+        remove_run(path)
+
+
+def remove_run(path):
+  """Remove a run file, if it still exists."""
+  try:
+    os.remove(path)
+  except OSError:
+    pass
 
 
 class TestBubbleSorter(unittest.TestCase):
@@ -194,6 +1091,38 @@ class TestBubbleSorter(unittest.TestCase):
     self.assertEqual(len(result), len(data))
     self.assertTrue(sorter.is_sorted(result))
 
+  def test_merge_sort_bottom_up(self):
+    sorter = MergeSorter(bottom_up=True)
+    data = self.data
+    result = sorter.sort(data)
+    print 'Merge Sort (bottom up)'
+    print result
+    self.assertIsNotNone(result)
+    self.assertEqual(len(result), len(data))
+    self.assertTrue(sorter.is_sorted(result))
+
+  def test_merge_sort_bottom_up_patterns(self):
+    sorter = MergeSorter(bottom_up=True)
+    rng = random.Random(3)
+    for size in (0, 1, 31, 32, 33, 64, 100, 1000, 4097):
+      patterns = [
+          [rng.random() for _ in xrange(size)],
+          [rng.randint(0, 3) for _ in xrange(size)],
+          range(size),
+          range(size, 0, -1),
+          range(size / 2, size) + range(size / 2),
+      ]
+      for data in patterns:
+        self.assertEqual(sorter.sort(data), sorted(data))
+
+  def test_merge_sort_bottom_up_is_stable(self):
+    rng = random.Random(4)
+    data = [KeyedItem(rng.randint(0, 10), i) for i in xrange(2000)]
+    result = MergeSorter(bottom_up=True).sort(data)
+    expected = sorted(data, key=lambda item: item.key)
+    self.assertEqual([item.tag for item in result],
+                     [item.tag for item in expected])
+
   def test_heap_sort(self):
     sorter = HeapSorter()
     data = self.data
@@ -224,6 +1153,282 @@ class TestBubbleSorter(unittest.TestCase):
     self.assertEqual(len(result), len(data))
     self.assertTrue(sorter.is_sorted(result))
 
+  def test_hybrid_sort(self):
+    sorter = HybridSorter()
+    data = self.data
+    result = sorter.sort(data)
+    print 'Hybrid Sort'
+    print result
+    self.assertIsNotNone(result)
+    self.assertEqual(len(result), len(data))
+    self.assertTrue(sorter.is_sorted(result))
+
+  def test_hybrid_sort_patterns(self):
+    sorter = HybridSorter()
+    rng = random.Random(1)
+    nearly_sorted = range(1000)
+    for _ in xrange(10):
+      i = rng.randrange(1000)
+      j = rng.randrange(1000)
+      nearly_sorted[i], nearly_sorted[j] = nearly_sorted[j], nearly_sorted[i]
+    patterns = [
+        [],
+        [1],
+        range(1000),
+        range(1000, 0, -1),
+        [7] * 1000,
+        nearly_sorted,
+        [rng.randint(0, 5) for _ in xrange(1000)],
+        [rng.random() for _ in xrange(1000)],
+        range(500) + range(500, 0, -1),
+    ]
+    for data in patterns:
+      self.assertEqual(sorter.sort(data), sorted(data))
+
+  def test_hybrid_sort_runs_are_stable(self):
+    # Ten ascending runs and five strictly descending ones, with equal keys
+    # in every run, take the run merging path.
+    data = [KeyedItem(k, (i, k)) for i in xrange(10) for k in xrange(100)]
+    data += [KeyedItem(k, (i, k)) for i in xrange(10, 15)
+             for k in xrange(99, -1, -1)]
+    result = HybridSorter().sort(data)
+    expected = sorted(data, key=lambda item: item.key)
+    self.assertEqual([item.tag for item in result],
+                     [item.tag for item in expected])
+
+  def test_hybrid_sort_heap_fallback(self):
+    sorter = HybridSorter()
+    data = [random.randint(0, 100) for _ in xrange(200)]
+    expected = sorted(data)
+    sorter.intro_sort(data, 0, len(data) - 1, depth_limit=0)
+    self.assertEqual(data, expected)
+
+  def test_quick_sort_three_way(self):
+    sorter = QuickSorter(three_way=True)
+    data = self.data
+    result = sorter.sort(data)
+    print 'Quick Sort (three way)'
+    print result
+    self.assertIsNotNone(result)
+    self.assertEqual(len(result), len(data))
+    self.assertTrue(sorter.is_sorted(result))
+
+  def test_quick_sort_duplicates(self):
+    """Low-cardinality data larger than the recursion limit."""
+    size = sys.getrecursionlimit() * 3
+    rng = random.Random(2)
+    for data in ([rng.randint(0, 3) for _ in xrange(size)], [1] * size):
+      for sorter in (QuickSorter(three_way=True), QuickSorter()):
+        self.assertEqual(sorter.sort(data), sorted(data))
+
+  def test_counting_sort(self):
+    sorter = CountingSorter()
+    data = self.data
+    result = sorter.sort(data)
+    print 'Counting Sort'
+    print result
+    self.assertIsNotNone(result)
+    self.assertEqual(len(result), len(data))
+    self.assertTrue(sorter.is_sorted(result))
+
+  def test_radix_sort(self):
+    sorter = RadixSorter()
+    data = self.data
+    result = sorter.sort(data)
+    print 'Radix Sort'
+    print result
+    self.assertIsNotNone(result)
+    self.assertEqual(len(result), len(data))
+    self.assertTrue(sorter.is_sorted(result))
+
+  def test_integer_key_sorters(self):
+    rng = random.Random(5)
+    patterns = [
+        [],
+        [3],
+        [rng.randint(-50, 50) for _ in xrange(500)],
+        [rng.randint(0, 2 ** 40) for _ in xrange(500)],
+        [rng.randint(-2 ** 70, 2 ** 70) for _ in xrange(500)],
+        [7] * 10,
+    ]
+    for data in patterns:
+      self.assertEqual(RadixSorter().sort(data), sorted(data))
+      if len(data) == 0 or max(data) - min(data) < 2 ** 20:
+        self.assertEqual(CountingSorter().sort(data), sorted(data))
+
+  def test_integer_key_sorters_are_stable(self):
+    rng = random.Random(6)
+    data = [KeyedItem(rng.randint(-300, 300), i) for i in xrange(1000)]
+    expected = [item.tag for item in sorted(data, key=lambda x: x.key)]
+    for sorter in (CountingSorter(key=lambda x: x.key),
+                   RadixSorter(key=lambda x: x.key)):
+      result = sorter.sort(data)
+      self.assertEqual([item.tag for item in result], expected)
+      self.assertTrue(sorter.is_sorted(result))
+
+  def test_radix_sort_bytes(self):
+    rng = random.Random(7)
+    data = [''.join(chr(rng.randint(0, 255))
+                    for _ in xrange(rng.randint(0, 6)))
+            for _ in xrange(1000)]
+    data += ['abc', 'ab', 'abcd', 'ab', '']
+    self.assertEqual(RadixSorter().sort(data), sorted(data))
+    data = [KeyedItem('%03d' % rng.randint(0, 50), i) for i in xrange(500)]
+    expected = [item.tag for item in sorted(data, key=lambda x: x.key)]
+    result = RadixSorter(key=lambda x: x.key).sort(data)
+    self.assertEqual([item.tag for item in result], expected)
+
+  def test_integer_key_sorters_bad_keys(self):
+    self.assertRaises(ValueError, CountingSorter().sort, [1.5, 2])
+    self.assertRaises(ValueError, RadixSorter().sort, [1.5, 2])
+    self.assertRaises(ValueError, RadixSorter().sort, ['a', 2])
+    self.assertRaises(ValueError, CountingSorter().sort, [1, 1.5, 2])
+    self.assertRaises(ValueError, RadixSorter().sort, [1, 1.5, 2])
+
+  def test_counting_sort_wide_range(self):
+    """Key ranges much larger than the input are radix sorted."""
+    self.assertEqual(CountingSorter().sort([10 ** 9, 0]), [0, 10 ** 9])
+    self.assertEqual(CountingSorter().sort([10 ** 30, -5, 7]),
+                     [-5, 7, 10 ** 30])
+    data = [KeyedItem(k, i) for i, k in enumerate([10 ** 12, 3, 10 ** 12, 3])]
+    result = CountingSorter(key=lambda x: x.key).sort(data)
+    self.assertEqual([item.tag for item in result], [1, 3, 0, 2])
+
+  def test_vectorized_fallback(self):
+    """Non-numeric data uses the pure-Python sorts."""
+    data = ['b', 'c', 'a']
+    for sorter in (MergeSorter(vectorized=True),
+                   MergeSorter(vectorized=True, bottom_up=True),
+                   QuickSorter(vectorized=True)):
+      self.assertEqual(sorter.sort(data), ['a', 'b', 'c'])
+      self.assertEqual(sorter.sort(iter(data)), ['a', 'b', 'c'])
+      self.assertEqual(sorter.sort(x for x in data), ['a', 'b', 'c'])
+      self.assertEqual(sorter.sort(x for x in [3, 1, 2]), [1, 2, 3])
+      # Mixed and out of range numbers are not converted to float64.
+      data_mixed = [2 ** 60 + 1, 0.5, 2 ** 60]
+      self.assertEqual(sorter.sort(data_mixed), [0.5, 2 ** 60, 2 ** 60 + 1])
+      self.assertEqual(sorter.sort([2 ** 63, -1, 5]), [-1, 5, 2 ** 63])
+
+  def test_sort_by_key(self):
+    global numpy
+    data = ['ccc', 'a', 'bb', 'dd']
+    sorters = (MergeSorter(bottom_up=True), HybridSorter(), MergeSorter(),
+               QuickSorter(vectorized=True), CountingSorter(), RadixSorter())
+    saved_numpy = numpy
+    try:
+      for numpy in (saved_numpy, None):
+        for sorter in sorters:
+          self.assertEqual(sorter.sort_by_key(data, len),
+                           ['a', 'bb', 'dd', 'ccc'])
+          if not isinstance(sorter, CountingSorter):
+            self.assertEqual(sorter.sort_by_key(data, str), sorted(data))
+    finally:
+      numpy = saved_numpy
+      self.assertEqual(sorter.sort_by_key(data, lambda item: item),
+                       sorted(data))
+
+  def test_parallel_sort(self):
+    rng = random.Random(3)
+    patterns = [
+        [rng.randint(-sys.maxint - 1, sys.maxint) for _ in xrange(1000)],
+        [rng.random() for _ in xrange(1000)],
+        [str(rng.randint(0, 100)) for _ in xrange(1000)],
+        [rng.randint(0, 2 ** 70) for _ in xrange(1000)],
+    ]
+    for data in patterns:
+      sorter = ParallelSorter(MergeSorter(bottom_up=True), processes=2,
+                              chunk_size=300)
+      sorter.MIN_PARALLEL_SIZE = 0
+      self.assertEqual(sorter.sort(data), sorted(data))
+    self.assertEqual(ParallelSorter(processes=2).sort(self.data),
+                     sorted(self.data))
+    self.assertRaises(ValueError, ParallelSorter, processes=0)
+
+  def test_parallel_sort_keyed_sorter(self):
+    rng = random.Random(6)
+    data = [rng.randint(0, 50) for _ in xrange(200)]
+    for sorter in (CountingSorter(key=operator.neg),
+                   RadixSorter(key=operator.neg)):
+      parallel = ParallelSorter(sorter, processes=2, chunk_size=30)
+      parallel.MIN_PARALLEL_SIZE = 0
+      self.assertEqual(parallel.sort(data), sorted(data, key=operator.neg))
+    # Pickled buckets rather than a shared array.
+    data = [str(k) for k in data]
+    parallel = ParallelSorter(RadixSorter(key=len), processes=2, chunk_size=30)
+    parallel.MIN_PARALLEL_SIZE = 0
+    self.assertEqual(parallel.sort(data), sorted(data, key=len))
+
+  def test_parallel_sort_is_stable(self):
+    data = [KeyedItem(i % 7, i) for i in xrange(2000)]
+    sorter = ParallelSorter(MergeSorter(bottom_up=True), processes=2,
+                            chunk_size=500)
+    sorter.MIN_PARALLEL_SIZE = 0
+    result = sorter.sort(data)
+    self.assertEqual([(item.key, item.tag) for item in result],
+                     sorted((item.key, item.tag) for item in data))
+
+  def test_external_sort(self):
+    rng = random.Random(5)
+    patterns = [
+        [],
+        [rng.randint(0, 100) for _ in xrange(10)],
+        [rng.randint(0, 2 ** 70) for _ in xrange(1000)],
+        [rng.random() for _ in xrange(1000)],
+        [(rng.randint(0, 9), str(i)) for i in xrange(1000)],
+    ]
+    for max_runs in (2, 64):
+      sorter = ExternalSorter(MergeSorter(bottom_up=True), run_size=64,
+                              buffer_size=10, max_runs=max_runs)
+      for data in patterns:
+        self.assertEqual(sorter.sort(data), sorted(data))
+    self.assertEqual(ExternalSorter().sort(self.data), sorted(self.data))
+    self.assertRaises(ValueError, ExternalSorter, run_size=0)
+    self.assertRaises(ValueError, ExternalSorter, max_runs=1)
+
+  def test_external_sort_open_files(self):
+    fd_dir = '/proc/self/fd'
+    if not os.path.isdir(fd_dir):
+      return
+    open_files = len(os.listdir(fd_dir))
+    run_dir = tempfile.gettempdir()
+    run_files = len([name for name in os.listdir(run_dir)
+                     if name.startswith('sort-run-')])
+    sorter = ExternalSorter(run_size=10, max_runs=4)
+    result = sorter.sort_iter(xrange(2000, 0, -1))
+    self.assertEqual(next(result), 1)
+    # The final merge holds max_runs files open, and spilling holds none.
+    self.assertLessEqual(len(os.listdir(fd_dir)) - open_files, 4)
+    self.assertEqual(list(result), range(2, 2001))
+    self.assertEqual(len(os.listdir(fd_dir)), open_files)
+    self.assertEqual(len([name for name in os.listdir(run_dir)
+                          if name.startswith('sort-run-')]), run_files)
+
+  def test_external_sort_keyed_sorter(self):
+    rng = random.Random(6)
+    data = [rng.randint(0, 50) for _ in xrange(200)]
+    for sorter in (CountingSorter(key=operator.neg),
+                   RadixSorter(key=operator.neg)):
+      external = ExternalSorter(sorter, run_size=30, max_runs=3)
+      self.assertEqual(external.sort(data), sorted(data, key=operator.neg))
+
+  def test_external_sort_sorters(self):
+    data = ['c', 'b', 'a', 'e', 'd']
+    for sorter in (MergeSorter(), QuickSorter(vectorized=True), HeapSorter(),
+                   RadixSorter()):
+      external = ExternalSorter(sorter, run_size=2)
+      self.assertEqual(external.sort(data), sorted(data))
+      self.assertEqual(external.sort(iter(data)), sorted(data))
+
+  def test_external_sort_streams(self):
+    lines = ['%05d\n' % (i * 7919 % 1000) for i in xrange(1000)]
+    sorter = ExternalSorter(run_size=100)
+    result = sorter.sort_iter(iter(lines))
+    self.assertEqual(next(result), '00000\n')
+    self.assertEqual(list(result), sorted(lines)[1:])
+    # Items that marshal cannot store fail when the first run is spilled.
+    data = [KeyedItem(0, i) for i in xrange(200)]
+    self.assertRaises(ValueError, sorter.sort, data)
+
   def test_selection_sort(self):
     sorter = SelectionSorter()
     data = self.data
@@ -235,6 +1440,79 @@ class TestBubbleSorter(unittest.TestCase):
     self.assertTrue(sorter.is_sorted(result))
 
 
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class TestVectorizedSorters(unittest.TestCase):
+  """Test cases for the NumPy sort paths."""
+
+  def setUp(self):
+    rng = random.Random(8)
+    self.patterns = [
+        [],
+        [1],
+        [rng.randint(0, 100) for _ in xrange(5000)],
+        [rng.random() for _ in xrange(5000)],
+        [rng.randint(-2 ** 40, 2 ** 40) for _ in xrange(3000)],
+        range(5000, 0, -1),
+    ]
+
+  def test_vectorized_sorters(self):
+    for sorter in (MergeSorter(vectorized=True), QuickSorter(vectorized=True)):
+      for data in self.patterns:
+        result = sorter.sort(data)
+        self.assertIsInstance(result, list)
+        self.assertEqual(result, sorted(data))
+        result = sorter.sort(numpy.array(data))
+        self.assertIsInstance(result, numpy.ndarray)
+        self.assertEqual(result.tolist(), sorted(data))
+        self.assertTrue(sorter.is_sorted(result))
+
+  def test_quick_sort_keeps_equal_items(self):
+    data = [0.0] * 1500 + [-0.0] * 1500
+    result = QuickSorter(vectorized=True).sort(numpy.array(data))
+    self.assertEqual(numpy.signbit(result).sum(), 1500)
+
+  def test_is_sorted(self):
+    sorter = Sorter()
+    self.assertTrue(sorter.is_sorted(numpy.array([])))
+    self.assertTrue(sorter.is_sorted(numpy.array([1, 2, 2, 3])))
+    self.assertFalse(sorter.is_sorted(numpy.array([1, 3, 2])))
+
+  def test_merge_arrays_is_stable(self):
+    left = numpy.array([1, 2, 2, 5])
+    right = numpy.array([2, 3, 5])
+    out = numpy.empty(7, dtype=int)
+    MergeSorter().merge_arrays(left, right, out)
+    self.assertEqual(out.tolist(), [1, 2, 2, 2, 3, 5, 5])
+    order = MergeSorter().argsort([2, 1, 2, 1])
+    self.assertEqual(order, [1, 3, 0, 2])
+
+  def test_non_numeric_fallback(self):
+    data = [1, 'a', 2.5]
+    self.assertIsNone(as_numeric_array(data))
+    self.assertIsNone(as_numeric_array([1.0, float('nan')]))
+    self.assertIsNone(as_numeric_array([True, False]))
+    self.assertIsNone(as_numeric_array([1, 2.5]))
+    self.assertIsNone(as_numeric_array([2 ** 63, 1]))
+    self.assertIsNone(as_numeric_array(iter([1, 2])))
+    self.assertIsNone(as_numeric_array(numpy.array(['a', 'b'])))
+    self.assertEqual(MergeSorter().argsort([2 ** 60 + 1, 0.5, 2 ** 60]),
+                     [1, 2, 0])
+
+
+class KeyedItem(object):
+  """Test item that is compared by key only, with a tag to check stability."""
+
+  def __init__(self, key, tag):
+    self.key = key
+    self.tag = tag
+
+  def __lt__(self, other):
+    return self.key < other.key
+
+  def __gt__(self, other):
+    return self.key > other.key
+
+
 DATA = None
 def test_data():
   global DATA